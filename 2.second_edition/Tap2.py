@@ -1,16 +1,40 @@
 import time
+
+class StartupTimer:
+    """记录启动各阶段耗时，用于冷启动分析"""
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = []
+
+    def mark(self, name: str) -> None:
+        """记录从上一阶段到现在的耗时"""
+        now = time.perf_counter()
+        self.stages.append((name, now - self.last))
+        self.last = now
+
+    def report(self) -> str:
+        """生成耗时报告"""
+        parts = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.stages)
+        return f"启动耗时 {(self.last - self.start) * 1000:.1f}ms: {parts}"
+
+STARTUP = StartupTimer()
+
+# pynput、PIL 和文件对话框在首次使用时才导入，缩短冷启动时间
 import threading
+import hashlib
+import io
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
-from pynput import mouse, keyboard
-from pynput.mouse import Button
-from pynput.keyboard import Key, KeyCode, Listener
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-from PIL import Image, ImageTk
+from tkinter import ttk, messagebox
 import os
-from typing import List, Dict, Any, Optional
+from typing import Dict, Any, Optional
+
+from macrotap import (StepManager, MacroEngine, MacroRecorder, StepTimings, DEFAULT_CONFIG,
+                      HotkeyTable, MacroLibrary, MacroProfile, ProgramCache, CONTROL_TYPES, BackgroundWriter,
+                      atomic_write, dump_steps, load_profiles, key_name)
+
+STARTUP.mark("导入模块")
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -23,10 +47,18 @@ class Strings:
     STATUS_PREPARING = "状态: 准备中"
     STATUS_RUNNING = "状态: 正在使用"
     STATUS_STOPPED = "状态: 已停止"
-    HOTKEY_INFO = "快捷键: F键开始 | Q键停止\n开始后有5秒延迟时间，请切换到目标窗口"
+    HOTKEY_INFO = "快捷键: F键开始 | Q键停止 | P键暂停/继续 | F9录制\n开始后有倒计时(默认5秒)，请切换到目标窗口"
     STEP_DELAY = "步骤间隔(秒):"
     LOOP_DELAY = "循环间隔(秒):"
     LOOP_COUNT = "循环次数(0=无限):"
+    COUNTDOWN = "开始倒计时(秒):"
+    TARGET_RATE = "目标速率(0=关闭):"
+    RATE_APS = "次/秒"
+    RATE_LPM = "轮/分"
+    JITTER = "随机抖动(步骤/循环 秒):"
+    JITTER_UNIFORM = "均匀"
+    JITTER_NORMAL = "正态"
+    JITTER_TRIANGULAR = "三角"
     SET = "设置"
     ADD_STEP = "添加步骤"
     EDIT_STEP = "编辑步骤"
@@ -34,6 +66,8 @@ class Strings:
     CLEAR_STEPS = "清空步骤"
     START = "开始 (F)"
     STOP = "停止 (Q)"
+    PAUSE = "暂停 (P)"
+    RESUME = "继续 (P)"
     STEP_TYPE = "步骤类型:"
     MOUSE_BUTTON = "鼠标按钮:"
     ACTION = "动作:"
@@ -49,74 +83,317 @@ class Strings:
     MOUSE = "鼠标"
     KEYBOARD = "键盘"
     DELAY_STEP = "延时"
+    CONTROL_STEP = "流程控制"
+    CONTROL_KIND = "控制:"
+    REPEAT = "重复开始"
+    REPEAT_END = "重复结束"
+    LABEL = "标签"
+    GOTO = "跳转到标签"
+    REPEAT_COUNT = "次数(跳转留空=无限):"
+    LABEL_NAME = "标签名:"
     LEFT = "左键"
     RIGHT = "右键"
     MIDDLE = "中键"
     CLICK = "点击"
     PRESS = "按下"
     RELEASE = "释放"
+    BURST = "连发"
+    BURST_COUNT = "连发次数:"
+    BURST_CPS = "每秒次数:"
     LOAD_BG = "加载背景"
     NO_BG = "无背景"
+    JUMP = "跳转"
+    SEARCH = "查找"
+    MENU_TOOLS = "工具"
+    EXPORT_TIMINGS = "导出时序数据"
+    LIBRARY = "宏库"
+    LIBRARY_LOAD = "载入到编辑器"
+    LIBRARY_RUN = "运行"
+    LIBRARY_SAVE = "保存当前步骤"
+    LIBRARY_TAGS = "设置标签"
+    LIBRARY_DELETE = "删除"
+    LIBRARY_REFRESH = "刷新"
+    RECORD = "录制 (F9)"
+    STOP_RECORD = "停止录制 (F9)"
 
-class StepManager:
-    """步骤管理器"""
-    def __init__(self):
-        self.steps = []
-        
-    def add_step(self, step_data: Dict[str, Any]) -> None:
-        """添加步骤"""
-        self.steps.append(step_data)
-        
-    def remove_step(self, index: int) -> Optional[Dict[str, Any]]:
-        """删除步骤"""
-        if 0 <= index < len(self.steps):
-            return self.steps.pop(index)
-        return None
-        
-    def clear(self) -> None:
-        """清空所有步骤"""
-        self.steps.clear()
-        
-    def get_step(self, index: int) -> Optional[Dict[str, Any]]:
-        """获取指定步骤"""
-        if 0 <= index < len(self.steps):
-            return self.steps[index]
+# 目标速率单位的显示名称
+RATE_UNIT_NAMES = {"aps": Strings.RATE_APS, "lpm": Strings.RATE_LPM}
+
+# 抖动分布的显示名称
+JITTER_DIST_NAMES = {"uniform": Strings.JITTER_UNIFORM, "normal": Strings.JITTER_NORMAL,
+                     "triangular": Strings.JITTER_TRIANGULAR}
+
+# 主框架的背景色: 无背景图片时、有背景图片时
+THEME_PLAIN_BG = "#f0f0f0"
+THEME_IMAGE_BG = "#ffffff"
+
+# 运行中界面轮询引擎状态的间隔(毫秒)
+STATUS_REFRESH_MS = 100
+
+# 步骤对话框中可选的按键
+KEY_CHOICES = (
+    "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m",
+    "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z",
+    "0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
+    "esc", "enter", "space", "tab", "shift", "ctrl", "alt"
+)
+
+# 背景缩略图的缓存目录，文件名包含源文件路径的哈希、修改时间、大小和目标尺寸上限
+BG_CACHE_DIR = "bg_cache"
+
+def background_bounds(screen_width: int, screen_height: int) -> tuple:
+    """背景图片缩放后的最大宽高"""
+    return min(1000, screen_width - 100), min(700, screen_height - 100)
+
+def background_thumbnail(image_path: str, bounds: tuple, screen_ratio: float) -> str:
+    """返回缩放好的背景图片(PNG)路径，缓存中没有时生成
+
+    在后台线程中调用，不接触 tkinter。缓存按源文件路径、修改时间、大小和尺寸上限区分，
+    源文件变化后生成新的缩略图并删除同一源文件的旧缩略图。
+    """
+    stat = os.stat(image_path)
+    source_key = hashlib.sha1(os.path.abspath(image_path).encode("utf-8")).hexdigest()[:16]
+    cache_path = os.path.join(BG_CACHE_DIR, f"{source_key}-{stat.st_mtime_ns}-{stat.st_size}-"
+                                            f"{bounds[0]}x{bounds[1]}-{screen_ratio:.4f}.png")
+    if os.path.exists(cache_path):
+        return cache_path
+
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        img_ratio = image.width / image.height
+        if img_ratio > screen_ratio:
+            size = (bounds[0], int(bounds[0] / img_ratio))
+        else:
+            size = (int(bounds[1] * img_ratio), bounds[1])
+        # JPEG 可以直接以缩小的比例解码，不必先展开整张原图
+        image.draft("RGB", size)
+        thumbnail = image.convert("RGBA").resize(size, Image.LANCZOS)
+    data = io.BytesIO()
+    thumbnail.save(data, "PNG")
+
+    os.makedirs(BG_CACHE_DIR, exist_ok=True)
+    for name in os.listdir(BG_CACHE_DIR):
+        if name.startswith(source_key + "-"):
+            try:
+                os.remove(os.path.join(BG_CACHE_DIR, name))
+            except OSError:
+                pass
+    atomic_write(cache_path, data.getvalue())
+    return cache_path
+
+def describe_step(index: int, step: Dict[str, Any]) -> tuple:
+    """步骤列表中一行的显示内容"""
+    if step.get("type") == "mouse":
+        if step.get("action") == "move":
+            return (index + 1, "鼠标", f"移动到 ({step.get('x')}, {step.get('y')})")
+        if step.get("action") == "burst":
+            return (index + 1, "鼠标", f"{step.get('button')}键 连发{step.get('count')}次 {step.get('cps')}次/秒")
+        return (index + 1, "鼠标", f"{step.get('button')}键 {step.get('action')}")
+    if step.get("type") == "keyboard":
+        if step.get("action") == "type":
+            return (index + 1, "键盘", f"输入 {step.get('text')}")
+        return (index + 1, "键盘", f"{step.get('key')}键 {step.get('action')}")
+    if step.get("type") == "delay":
+        return (index + 1, "延时", f"{step.get('duration')}秒")
+    if step.get("type") == "repeat":
+        return (index + 1, "流程", f"重复{step.get('count')}次 开始")
+    if step.get("type") == "end":
+        return (index + 1, "流程", "重复 结束")
+    if step.get("type") == "label":
+        return (index + 1, "流程", f"标签 {step.get('name')}")
+    if step.get("type") == "goto":
+        if step.get("count") is None:
+            return (index + 1, "流程", f"跳转到 {step.get('label')}")
+        return (index + 1, "流程", f"跳转到 {step.get('label')} {step.get('count')}次")
+    return (index + 1, str(step.get("type")), json.dumps(step, ensure_ascii=False))
+
+class StepListView:
+    """虚拟化的步骤列表
+
+    Treeview 中只保留可见区域的行，滚动时复用这些行显示其他步骤；
+    订阅 StepManager 的变更通知，增删改只刷新受影响的可见行，耗时与步骤总数无关。
+    """
+    COLUMNS = ("序号", "类型", "详情")
+    DEFAULT_ROW_HEIGHT = 20
+
+    def __init__(self, parent, step_manager: StepManager, on_activate):
+        self.step_manager = step_manager
+        self.offset = 0          # 第一行可见步骤的序号
+        self.page_size = 6       # 可见行数
+        self.selected = None     # 选中步骤的序号
+        self.rows = []           # 复用的行 item id
+
+        frame = ttk.Frame(parent)
+        frame.pack(pady=10, padx=10, fill="both", expand=True)
+        self.tree = ttk.Treeview(frame, columns=self.COLUMNS, show="headings", height=self.page_size,
+                                 selectmode="browse")
+        for col in self.COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=100)
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self.tree.bind("<Configure>", self.on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<Double-1>", on_activate)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_by(-1 if e.delta > 0 else 1) or "break")
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-1) or "break")
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(1) or "break")
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1) or "break")
+        self.tree.bind("<Down>", lambda e: self.move_selection(1) or "break")
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.page_size) or "break")
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.page_size) or "break")
+
+        step_manager.subscribe(self.on_steps_changed)
+        self.render()
+
+    @property
+    def total(self) -> int:
+        return len(self.step_manager.steps)
+
+    def destroy(self) -> None:
+        """取消订阅"""
+        self.step_manager.unsubscribe(self.on_steps_changed)
+
+    def render(self, first_row: int = 0) -> None:
+        """刷新从第 first_row 个可见行开始的内容"""
+        visible = max(0, min(self.page_size, self.total - self.offset))
+        while len(self.rows) < visible:
+            self.rows.append(self.tree.insert("", "end"))
+        while len(self.rows) > visible:
+            self.tree.delete(self.rows.pop())
+
+        steps = self.step_manager.steps
+        for row in range(max(0, first_row), visible):
+            index = self.offset + row
+            self.tree.item(self.rows[row], values=describe_step(index, steps[index]))
+        self.sync_selection()
+        self.update_scrollbar()
+
+    def sync_selection(self) -> None:
+        """把选中的步骤映射到可见行"""
+        row = None if self.selected is None else self.selected - self.offset
+        if row is not None and 0 <= row < len(self.rows):
+            if self.tree.selection() != (self.rows[row],):
+                self.tree.selection_set(self.rows[row])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+    def update_scrollbar(self) -> None:
+        total = self.total
+        if total <= self.page_size:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.offset / total, (self.offset + self.page_size) / total)
+
+    def scroll_to(self, offset: int) -> None:
+        """滚动到以 offset 为第一行的位置"""
+        offset = max(0, min(offset, self.total - self.page_size))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, rows: int) -> None:
+        self.scroll_to(self.offset + rows)
+
+    def see(self, index: int) -> None:
+        """滚动到并选中指定步骤"""
+        if not 0 <= index < self.total:
+            return
+        self.selected = index
+        if index < self.offset:
+            self.scroll_to(index)
+        elif index >= self.offset + self.page_size:
+            self.scroll_to(index - self.page_size + 1)
+        self.sync_selection()
+
+    def move_selection(self, delta: int) -> None:
+        if self.total:
+            current = self.offset if self.selected is None else self.selected + delta
+            self.see(max(0, min(current, self.total - 1)))
+
+    def selected_index(self) -> Optional[int]:
+        """选中步骤的序号，未选中时为 None"""
+        return self.selected
+
+    def search(self, text: str) -> Optional[int]:
+        """从当前选中的下一行开始查找详情包含 text 的步骤，找到时跳转过去"""
+        steps = self.step_manager.steps
+        total = len(steps)
+        start = 0 if self.selected is None else self.selected + 1
+        for n in range(total):
+            index = (start + n) % total
+            values = describe_step(index, steps[index])
+            if text in values[1] or text in values[2]:
+                self.see(index)
+                return index
         return None
-        
-    def update_step(self, index: int, step_data: Dict[str, Any]) -> bool:
-        """更新步骤"""
-        if 0 <= index < len(self.steps):
-            self.steps[index] = step_data
-            return True
-        return False
-        
-    def move_step(self, from_index: int, to_index: int) -> bool:
-        """移动步骤位置"""
-        if 0 <= from_index < len(self.steps) and 0 <= to_index < len(self.steps):
-            step = self.steps.pop(from_index)
-            self.steps.insert(to_index, step)
-            return True
-        return False
-        
-    def save_to_file(self, filename: str) -> bool:
-        """保存步骤到文件"""
-        try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(self.steps, f, ensure_ascii=False, indent=2)
-            return True
-        except Exception as e:
-            logger.error(f"保存步骤到文件失败: {e}")
-            return False
-            
-    def load_from_file(self, filename: str) -> bool:
-        """从文件加载步骤"""
-        try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                self.steps = json.load(f)
-            return True
-        except Exception as e:
-            logger.error(f"从文件加载步骤失败: {e}")
-            return False
+
+    def on_scrollbar(self, action, value, unit=None) -> None:
+        if action == "moveto":
+            self.scroll_to(int(float(value) * self.total))
+        elif action == "scroll":
+            step = self.page_size if unit == "pages" else 1
+            self.scroll_by(int(value) * step)
+
+    def on_resize(self, event) -> None:
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or self.DEFAULT_ROW_HEIGHT
+        page_size = max(1, (event.height - int(row_height)) // int(row_height))
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.offset = max(0, min(self.offset, self.total - page_size))
+            self.render()
+
+    def on_select(self, event) -> None:
+        selection = self.tree.selection()
+        if selection and selection[0] in self.rows:
+            self.selected = self.offset + self.rows.index(selection[0])
+
+    def on_steps_changed(self, kind: str, *args: int) -> None:
+        """StepManager 变更通知: 只刷新受影响的可见行"""
+        if kind == "reset":
+            self.offset = 0
+            self.selected = None
+            self.render()
+            return
+
+        if kind == "update":
+            row = args[0] - self.offset
+            if 0 <= row < len(self.rows):
+                self.tree.item(self.rows[row], values=describe_step(args[0], self.step_manager.steps[args[0]]))
+            return
+
+        if kind == "insert":
+            first = args[0]
+            if self.selected is not None and self.selected >= first:
+                self.selected += 1
+        elif kind == "delete":
+            first = args[0]
+            if self.selected == first:
+                self.selected = None
+            elif self.selected is not None and self.selected > first:
+                self.selected -= 1
+            offset = max(0, min(self.offset, self.total - self.page_size))
+            if offset != self.offset:
+                # 删除末尾附近的步骤时窗口整体上移
+                self.offset = first = offset
+        elif kind == "move":
+            source, target = args
+            first = min(source, target)
+            if self.selected == source:
+                self.selected = target
+            elif self.selected is not None and first <= self.selected <= max(source, target):
+                self.selected += 1 if source > target else -1
+        else:
+            first = 0
+
+        # 插入点之后的序号都会变化，但只需要刷新可见范围内的行
+        if first < self.offset + self.page_size:
+            self.render(first - self.offset)
+        else:
+            self.update_scrollbar()
 
 class AutoClicker:
     def __init__(self, root):
@@ -124,9 +401,27 @@ class AutoClicker:
         self.setup_window()
         self.setup_managers()
         self.load_config()
+        # 加载完成后再订阅，之后的每次修改都会触发后台保存
+        self.step_manager.subscribe(lambda kind, *args: self.schedule_save())
+        STARTUP.mark("加载配置")
         self.create_widgets()
+        STARTUP.mark("创建控件")
+        # 首帧绘制之后再启动监听器，窗口尽早可见
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """首帧绘制后完成剩余的初始化"""
+        STARTUP.mark("首帧绘制")
         self.setup_listeners()
+        STARTUP.mark("热键监听")
+        # 输入控制器在后台提前创建，第一次开始时不必再等
+        threading.Thread(target=self.warm_backend, daemon=True).start()
         self.add_default_steps()
+        STARTUP.mark("默认步骤")
+        if self.config['bg_image'] and os.path.exists(self.config['bg_image']):
+            # 缩略图已缓存时几乎立即显示，否则在后台生成
+            self.set_background(self.config['bg_image'])
+        logger.info(STARTUP.report())
         
     def setup_window(self):
         """设置窗口属性"""
@@ -137,21 +432,42 @@ class AutoClicker:
         
         # 设置窗口关闭事件
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # 菜单栏
+        menubar = tk.Menu(self.root)
+        tools_menu = tk.Menu(menubar, tearoff=0)
+        tools_menu.add_command(label=Strings.LIBRARY, command=self.open_library_window)
+        tools_menu.add_command(label=Strings.EXPORT_TIMINGS, command=self.export_timings)
+        menubar.add_cascade(label=Strings.MENU_TOOLS, menu=tools_menu)
+        self.root.config(menu=menubar)
         
     def setup_managers(self):
         """初始化管理器"""
         self.step_manager = StepManager()
-        self.config = {
-            'step_delay': 0.5,
-            'loop_delay': 0.5,
-            'loop_count': 0,  # 0表示无限循环
-            'start_hotkey': 'f',
-            'stop_hotkey': 'q',
-            'bg_image': None
-        }
+        self.config = dict(DEFAULT_CONFIG)
+        self.engine = None
+        self.timings = StepTimings()
+        self.recorder = MacroRecorder()
+        self.hotkeys = HotkeyTable()
+        self.library = None
+        self.backend = None
+        self.backend_lock = threading.Lock()
+        self.program_cache = ProgramCache()
+        self.writer = BackgroundWriter()
+        self.saved_config_text = None
+        self.save_scheduled = False
+        self.bg_version = 0
+        self.bg_photo = None
+        self.profiles = []
+        self.active_profile = None
+        self.thread = None
         self.is_running = False
         self.is_counting_down = False
+        self.is_resuming = False
+        # 停止时唤醒倒计时，倒计时中的等待都用它代替 sleep
+        self.stop_event = threading.Event()
         self.current_loop = 0
+        self.status_version = 0
         
     def load_config(self):
         """加载配置"""
@@ -160,6 +476,8 @@ class AutoClicker:
                 with open('config.json', 'r', encoding='utf-8') as f:
                     saved_config = json.load(f)
                     self.config.update(saved_config)
+                if self.config == saved_config:
+                    self.saved_config_text = self.config_text()
                     
                 # 加载步骤
                 if os.path.exists('steps.json'):
@@ -167,29 +485,59 @@ class AutoClicker:
         except Exception as e:
             logger.error(f"加载配置失败: {e}")
             
+    def config_text(self):
+        """配置文件的内容"""
+        return json.dumps(self.config, ensure_ascii=False, indent=2)
+
+    def schedule_save(self):
+        """在本轮事件处理结束后保存一次，同一轮中的多次修改(如录制完成时逐条添加)只保存一次"""
+        if not self.save_scheduled:
+            self.save_scheduled = True
+            self.root.after_idle(self.save_config)
+
     def save_config(self):
-        """保存配置"""
-        try:
-            with open('config.json', 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
-                
-            # 保存步骤
-            self.step_manager.save_to_file('steps.json')
-        except Exception as e:
-            logger.error(f"保存配置失败: {e}")
+        """把有修改的配置和步骤交给后台线程保存
+
+        界面线程只做序列化配置和复制步骤列表，写文件在后台进行，连续的修改合并为一次写入；
+        文件先写临时文件再替换，不会因中途崩溃而损坏。
+        """
+        self.save_scheduled = False
+        config_text = self.config_text()
+        if config_text != self.saved_config_text:
+            def save_config_file():
+                atomic_write('config.json', config_text.encode('utf-8'))
+                self.saved_config_text = config_text
+            self.writer.submit('config.json', save_config_file)
+
+        if self.step_manager.dirty:
+            revision, steps = self.step_manager.snapshot()
+            def save_steps_file():
+                dump_steps(steps, 'steps.json')
+                self.step_manager.mark_saved(revision)
+            self.writer.submit('steps.json', save_steps_file)
             
     def on_close(self):
         """窗口关闭时的清理工作"""
         self.save_config()
+        if not self.writer.close():
+            logger.error("保存配置超时")
         if hasattr(self, 'keyboard_listener') and self.keyboard_listener and self.keyboard_listener.is_alive():
             self.keyboard_listener.stop()
         self.root.destroy()
         
     def create_widgets(self):
-        """创建界面组件"""
-        # 创建主框架
-        self.main_frame = tk.Frame(self.root, bg="#f0f0f0", bd=2, relief="raised")
-        self.main_frame.pack(expand=True, fill="both", padx=20, pady=20)
+        """创建界面组件，只在启动时调用一次
+
+        主框架放在铺满窗口的画布上，更换或移除背景时只修改画布上的图片和主框架的
+        位置、颜色(见 apply_theme)，控件、运行状态、选中行和滚动位置都保持不变。
+        """
+        # 背景画布和主框架
+        self.canvas = tk.Canvas(self.root, bg=THEME_PLAIN_BG, highlightthickness=0)
+        self.canvas.pack(expand=True, fill="both")
+        self.canvas.bind("<Configure>", self.on_canvas_resize)
+        self.bg_item = None
+        self.main_frame = tk.Frame(self.canvas, bd=2, relief="raised")
+        self.apply_theme()
         
         # 状态指示器
         self.status_indicator = tk.Frame(self.main_frame, height=30, bg="green")
@@ -260,22 +608,90 @@ class AutoClicker:
         set_loop_count_btn = ttk.Button(loop_count_frame, text=Strings.SET, command=self.set_loop_count)
         set_loop_count_btn.grid(row=0, column=2, padx=5)
         
-        # 步骤框架
-        steps_frame = ttk.LabelFrame(self.main_frame, text=Strings.STEP_LIST)
-        steps_frame.pack(pady=10, padx=20, fill="both", expand=True)
+        # 开始倒计时设置
+        countdown_frame = ttk.Frame(delay_frame)
+        countdown_frame.pack(pady=5, fill="x", padx=10)
+        
+        countdown_label = ttk.Label(countdown_frame, text=Strings.COUNTDOWN)
+        countdown_label.grid(row=0, column=0, padx=5, sticky="w")
         
-        # 使用Treeview显示步骤列表
-        columns = ("序号", "类型", "详情")
-        self.steps_tree = ttk.Treeview(steps_frame, columns=columns, show="headings", height=6)
+        self.countdown_var = tk.StringVar(value=str(self.config['countdown']))
+        countdown_entry = ttk.Entry(countdown_frame, textvariable=self.countdown_var, width=10)
+        countdown_entry.grid(row=0, column=1, padx=5)
         
-        for col in columns:
-            self.steps_tree.heading(col, text=col)
-            self.steps_tree.column(col, width=100)
+        set_countdown_btn = ttk.Button(countdown_frame, text=Strings.SET, command=self.set_countdown)
+        set_countdown_btn.grid(row=0, column=2, padx=5)
         
-        self.steps_tree.pack(pady=10, padx=10, fill="both", expand=True)
+        # 目标速率设置，开启后按速率播放，不再使用上面的间隔(每分钟轮数时周期平均分配给各步骤)
+        target_rate_frame = ttk.Frame(delay_frame)
+        target_rate_frame.pack(pady=5, fill="x", padx=10)
         
-        # 绑定双击编辑事件
-        self.steps_tree.bind("<Double-1>", self.edit_step_event)
+        target_rate_label = ttk.Label(target_rate_frame, text=Strings.TARGET_RATE)
+        target_rate_label.grid(row=0, column=0, padx=5, sticky="w")
+        
+        self.target_rate_var = tk.StringVar(value=str(self.config['target_rate']))
+        target_rate_entry = ttk.Entry(target_rate_frame, textvariable=self.target_rate_var, width=10)
+        target_rate_entry.grid(row=0, column=1, padx=5)
+        
+        self.target_unit_var = tk.StringVar(value=RATE_UNIT_NAMES[self.config['target_unit']])
+        target_unit_combobox = ttk.Combobox(target_rate_frame, textvariable=self.target_unit_var,
+                                            values=[Strings.RATE_APS, Strings.RATE_LPM],
+                                            state="readonly", width=6)
+        target_unit_combobox.grid(row=0, column=2, padx=5)
+        
+        set_target_rate_btn = ttk.Button(target_rate_frame, text=Strings.SET, command=self.set_target_rate)
+        set_target_rate_btn.grid(row=0, column=3, padx=5)
+        
+        # 随机抖动设置，种子在配置文件的 jitter_seed 中指定
+        jitter_frame = ttk.Frame(delay_frame)
+        jitter_frame.pack(pady=5, fill="x", padx=10)
+        
+        jitter_label = ttk.Label(jitter_frame, text=Strings.JITTER)
+        jitter_label.grid(row=0, column=0, padx=5, sticky="w")
+        
+        self.step_jitter_var = tk.StringVar(value=str(self.config['step_jitter']))
+        step_jitter_entry = ttk.Entry(jitter_frame, textvariable=self.step_jitter_var, width=6)
+        step_jitter_entry.grid(row=0, column=1, padx=5)
+        
+        self.loop_jitter_var = tk.StringVar(value=str(self.config['loop_jitter']))
+        loop_jitter_entry = ttk.Entry(jitter_frame, textvariable=self.loop_jitter_var, width=6)
+        loop_jitter_entry.grid(row=0, column=2, padx=5)
+        
+        self.jitter_dist_var = tk.StringVar(value=JITTER_DIST_NAMES.get(self.config['jitter_dist'],
+                                                                         Strings.JITTER_UNIFORM))
+        jitter_dist_combobox = ttk.Combobox(jitter_frame, textvariable=self.jitter_dist_var,
+                                            values=list(JITTER_DIST_NAMES.values()),
+                                            state="readonly", width=6)
+        jitter_dist_combobox.grid(row=0, column=3, padx=5)
+        
+        set_jitter_btn = ttk.Button(jitter_frame, text=Strings.SET, command=self.set_jitter)
+        set_jitter_btn.grid(row=0, column=4, padx=5)
+        
+        # 步骤框架
+        steps_frame = ttk.LabelFrame(self.main_frame, text=Strings.STEP_LIST)
+        steps_frame.pack(pady=10, padx=20, fill="both", expand=True)
+        
+        # 虚拟化的步骤列表，双击编辑
+        self.step_view = StepListView(steps_frame, self.step_manager, self.edit_step_event)
+        self.steps_tree = self.step_view.tree
+
+        # 跳转和查找
+        find_frame = ttk.Frame(steps_frame)
+        find_frame.pack(pady=(0, 5), padx=10, fill="x")
+
+        self.jump_var = tk.StringVar()
+        jump_entry = ttk.Entry(find_frame, textvariable=self.jump_var, width=8)
+        jump_entry.grid(row=0, column=0, padx=5)
+        jump_entry.bind("<Return>", lambda e: self.jump_to_step())
+        jump_btn = ttk.Button(find_frame, text=Strings.JUMP, command=self.jump_to_step)
+        jump_btn.grid(row=0, column=1, padx=5)
+
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(find_frame, textvariable=self.search_var, width=16)
+        search_entry.grid(row=0, column=2, padx=5)
+        search_entry.bind("<Return>", lambda e: self.search_step())
+        search_btn = ttk.Button(find_frame, text=Strings.SEARCH, command=self.search_step)
+        search_btn.grid(row=0, column=3, padx=5)
         
         # 按钮框架
         button_frame = ttk.Frame(self.main_frame)
@@ -296,6 +712,11 @@ class AutoClicker:
         # 清空步骤按钮
         clear_steps_btn = ttk.Button(button_frame, text=Strings.CLEAR_STEPS, command=self.clear_steps)
         clear_steps_btn.grid(row=0, column=3, padx=5)
+
+        # 录制按钮
+        self.record_btn = ttk.Button(button_frame, text=Strings.RECORD,
+                                     command=lambda: self.toggle_recording(from_button=True))
+        self.record_btn.grid(row=0, column=4, padx=5)
         
         # 控制按钮框架
         control_frame = ttk.LabelFrame(self.main_frame, text=Strings.CONTROL)
@@ -312,19 +733,23 @@ class AutoClicker:
         self.stop_btn = ttk.Button(control_btn_frame, text=Strings.STOP, command=self.stop_autoclicker, state="disabled")
         self.stop_btn.grid(row=0, column=1, padx=5)
         
+        # 暂停/继续按钮
+        self.pause_btn = ttk.Button(control_btn_frame, text=Strings.PAUSE, command=self.toggle_pause, state="disabled")
+        self.pause_btn.grid(row=0, column=2, padx=5)
+        
         # 保存/加载配置按钮
         save_config_btn = ttk.Button(control_btn_frame, text=Strings.SAVE_CONFIG, command=self.save_config)
-        save_config_btn.grid(row=0, column=2, padx=5)
+        save_config_btn.grid(row=0, column=3, padx=5)
         
         load_config_btn = ttk.Button(control_btn_frame, text=Strings.LOAD_CONFIG, command=self.load_config_ui)
-        load_config_btn.grid(row=0, column=3, padx=5)
+        load_config_btn.grid(row=0, column=4, padx=5)
         
         # 加载背景按钮
         load_bg_btn = ttk.Button(control_btn_frame, text=Strings.LOAD_BG, command=self.load_background)
-        load_bg_btn.grid(row=0, column=4, padx=5)
+        load_bg_btn.grid(row=0, column=5, padx=5)
         
         no_bg_btn = ttk.Button(control_btn_frame, text=Strings.NO_BG, command=self.remove_background)
-        no_bg_btn.grid(row=0, column=5, padx=5)
+        no_bg_btn.grid(row=0, column=6, padx=5)
         
         # 倒计时标签
         self.countdown_label = ttk.Label(self.main_frame, text="", font=("微软雅黑", 12, "bold"), foreground="blue")
@@ -333,19 +758,42 @@ class AutoClicker:
         # 循环计数标签
         self.loop_count_label = ttk.Label(self.main_frame, text="", font=("微软雅黑", 10), foreground="green")
         self.loop_count_label.pack(pady=2)
-        
-        # 更新步骤列表显示
-        self.update_steps_tree()
+
+        # 时序统计标签
+        self.timing_label = ttk.Label(self.main_frame, text="", font=("微软雅黑", 9), foreground="gray")
+        self.timing_label.pack(pady=2)
     
     def setup_listeners(self):
         """设置键盘监听器"""
-        self.start_hotkey = {KeyCode.from_char(self.config['start_hotkey'])}
-        self.stop_hotkeys = {KeyCode.from_char(self.config['stop_hotkey'])}
-        
-        self.keyboard_listener = Listener(on_press=self.on_key_press)
+        from pynput.keyboard import Listener
+
+        self.build_hotkey_table()
+        self.keyboard_listener = Listener(on_press=self.on_key_press, on_release=self.on_key_release)
         self.keyboard_listener.daemon = True
         self.keyboard_listener.start()
     
+    def build_hotkey_table(self, base_dir="."):
+        """根据配置重建快捷键分派表，监听器不需要重启
+
+        宏列表的步骤在这里一次性读入，之后按快捷键切换宏不再访问磁盘。
+        """
+        hotkeys = HotkeyTable()
+        bindings = [
+            (self.config['start_hotkey'], ("start", None)),
+            (self.config['stop_hotkey'], ("stop", None)),
+            (self.config['pause_hotkey'], ("pause", None)),
+            (self.config['record_hotkey'], ("record", None)),
+        ]
+        self.profiles = load_profiles(self.config.get('profiles', []), base_dir)
+        bindings.extend((profile.hotkey, ("profile", profile)) for profile in self.profiles)
+        for chord, action in bindings:
+            try:
+                hotkeys.bind(chord, action)
+            except ValueError as e:
+                logger.error(f"绑定快捷键失败: {e}")
+        # 整体替换，监听线程看到的要么是旧表要么是新表
+        self.hotkeys = hotkeys
+    
     def set_step_delay(self):
         """设置步骤间隔时间"""
         try:
@@ -354,6 +802,7 @@ class AutoClicker:
                 messagebox.showerror("错误", "延迟时间必须在0-60秒之间")
                 return
             self.config['step_delay'] = delay
+            self.schedule_save()
             messagebox.showinfo("成功", f"步骤间延迟已设置为 {delay} 秒")
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数字")
@@ -366,6 +815,7 @@ class AutoClicker:
                 messagebox.showerror("错误", "延迟时间必须在0-3600秒之间")
                 return
             self.config['loop_delay'] = delay
+            self.schedule_save()
             messagebox.showinfo("成功", f"循环间延迟已设置为 {delay} 秒")
         except ValueError:
             messagebox.showerror("错误", "请输入有效的数字")
@@ -378,10 +828,63 @@ class AutoClicker:
                 messagebox.showerror("错误", "循环次数不能为负数")
                 return
             self.config['loop_count'] = count
+            self.schedule_save()
             messagebox.showinfo("成功", f"循环次数已设置为 {count}")
         except ValueError:
             messagebox.showerror("错误", "请输入有效的整数")
     
+    def set_countdown(self):
+        """设置开始前的倒计时"""
+        try:
+            seconds = int(self.countdown_var.get())
+            if seconds < 0 or seconds > 60:
+                messagebox.showerror("错误", "倒计时必须在0-60秒之间")
+                return
+            self.config['countdown'] = seconds
+            self.schedule_save()
+            messagebox.showinfo("成功", f"开始倒计时已设置为 {seconds} 秒")
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的整数")
+    
+    def set_target_rate(self):
+        """设置目标速率"""
+        try:
+            rate = float(self.target_rate_var.get())
+            if rate < 0:
+                messagebox.showerror("错误", "目标速率不能为负数")
+                return
+            unit = {name: unit for unit, name in RATE_UNIT_NAMES.items()}[self.target_unit_var.get()]
+            self.config['target_rate'] = rate
+            self.config['target_unit'] = unit
+            self.schedule_save()
+            if rate:
+                messagebox.showinfo("成功", f"目标速率已设置为 {rate} {self.target_unit_var.get()}")
+            else:
+                messagebox.showinfo("成功", "已关闭目标速率，按间隔时间播放")
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的数字")
+    
+    def set_jitter(self):
+        """设置步骤间隔和循环间隔的随机抖动"""
+        try:
+            step_jitter = float(self.step_jitter_var.get())
+            loop_jitter = float(self.loop_jitter_var.get())
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的数字")
+            return
+        if step_jitter < 0 or loop_jitter < 0:
+            messagebox.showerror("错误", "抖动幅度不能为负数")
+            return
+        dist = {name: dist for dist, name in JITTER_DIST_NAMES.items()}[self.jitter_dist_var.get()]
+        self.config['step_jitter'] = step_jitter
+        self.config['loop_jitter'] = loop_jitter
+        self.config['jitter_dist'] = dist
+        self.schedule_save()
+        if step_jitter or loop_jitter:
+            messagebox.showinfo("成功", f"随机抖动已设置为 步骤±{step_jitter}秒 循环±{loop_jitter}秒")
+        else:
+            messagebox.showinfo("成功", "已关闭随机抖动")
+    
     def update_status_indicator(self, status, color):
         """更新状态指示器"""
         def update():
@@ -398,32 +901,34 @@ class AutoClicker:
         self.step_manager.add_step({"type": "mouse", "button": "right", "action": "click"})
         self.step_manager.add_step({"type": "keyboard", "key": "esc", "action": "press"})
         self.step_manager.add_step({"type": "mouse", "button": "left", "action": "click"})
-        
-        self.update_steps_tree()
     
     def update_steps_tree(self):
-        """更新步骤树形视图"""
-        # 清空现有项目
-        for item in self.steps_tree.get_children():
-            self.steps_tree.delete(item)
-        
-        # 添加新项目
-        for i, step in enumerate(self.step_manager.steps):
-            if step["type"] == "mouse":
-                details = f"{step['button']}键 {step['action']}"
-                self.steps_tree.insert("", "end", values=(i+1, "鼠标", details))
-            elif step["type"] == "keyboard":
-                details = f"{step['key']}键 {step['action']}"
-                self.steps_tree.insert("", "end", values=(i+1, "键盘", details))
-            elif step["type"] == "delay":
-                details = f"{step['duration']}秒"
-                self.steps_tree.insert("", "end", values=(i+1, "延时", details))
+        """整体刷新步骤列表(只渲染可见行)"""
+        self.step_view.render()
+
+    def jump_to_step(self):
+        """跳转到指定序号的步骤"""
+        try:
+            index = int(self.jump_var.get()) - 1
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的步骤序号")
+            return
+        if not 0 <= index < len(self.step_manager.steps):
+            messagebox.showerror("错误", f"步骤序号必须在1-{len(self.step_manager.steps)}之间")
+            return
+        self.step_view.see(index)
+
+    def search_step(self):
+        """查找下一个匹配的步骤"""
+        text = self.search_var.get().strip()
+        if text and self.step_view.search(text) is None:
+            messagebox.showinfo("查找", f"没有找到包含 \"{text}\" 的步骤")
     
     def add_step_window(self):
         """添加步骤窗口"""
         window = tk.Toplevel(self.root)
         window.title(Strings.ADD_STEP)
-        window.geometry("300x300")
+        window.geometry("300x360")
         window.resizable(False, False)
         
         # 步骤类型选择
@@ -432,7 +937,7 @@ class AutoClicker:
         
         step_type = tk.StringVar(value="mouse")
         type_combobox = ttk.Combobox(window, textvariable=step_type, 
-                                    values=[Strings.MOUSE, Strings.KEYBOARD, Strings.DELAY_STEP], 
+                                    values=[Strings.MOUSE, Strings.KEYBOARD, Strings.DELAY_STEP, Strings.CONTROL_STEP], 
                                     state="readonly")
         type_combobox.pack(pady=5)
         
@@ -453,10 +958,25 @@ class AutoClicker:
         
         mouse_action = tk.StringVar(value=Strings.CLICK)
         mouse_action_combobox = ttk.Combobox(mouse_frame, textvariable=mouse_action, 
-                                            values=[Strings.CLICK, Strings.PRESS, Strings.RELEASE], 
+                                            values=[Strings.CLICK, Strings.PRESS, Strings.RELEASE, Strings.BURST], 
                                             state="readonly")
         mouse_action_combobox.grid(row=1, column=1, padx=5)
         
+        # 连发参数，仅在动作为连发时使用
+        burst_count_label = ttk.Label(mouse_frame, text=Strings.BURST_COUNT)
+        burst_count_label.grid(row=2, column=0, padx=5)
+        
+        burst_count = tk.StringVar(value="10")
+        burst_count_entry = ttk.Entry(mouse_frame, textvariable=burst_count, width=10)
+        burst_count_entry.grid(row=2, column=1, padx=5)
+        
+        burst_cps_label = ttk.Label(mouse_frame, text=Strings.BURST_CPS)
+        burst_cps_label.grid(row=3, column=0, padx=5)
+        
+        burst_cps = tk.StringVar(value="20")
+        burst_cps_entry = ttk.Entry(mouse_frame, textvariable=burst_cps, width=10)
+        burst_cps_entry.grid(row=3, column=1, padx=5)
+        
         # 键盘步骤框架
         keyboard_frame = ttk.Frame(window)
         
@@ -465,12 +985,7 @@ class AutoClicker:
         
         keyboard_key = tk.StringVar(value="a")
         keyboard_combobox = ttk.Combobox(keyboard_frame, textvariable=keyboard_key, 
-                                        values=[
-                                            "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", 
-                                            "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z",
-                                            "0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
-                                            "esc", "enter", "space", "tab", "shift", "ctrl", "alt"
-                                        ], state="readonly")
+                                        values=KEY_CHOICES, state="readonly")
         keyboard_combobox.grid(row=0, column=1, padx=5)
         
         keyboard_action_label = ttk.Label(keyboard_frame, text=Strings.ACTION)
@@ -492,20 +1007,41 @@ class AutoClicker:
         delay_entry = ttk.Entry(delay_frame, textvariable=delay_duration, width=10)
         delay_entry.grid(row=0, column=1, padx=5)
         
+        # 流程控制步骤框架
+        control_frame = ttk.Frame(window)
+        
+        control_kind_label = ttk.Label(control_frame, text=Strings.CONTROL_KIND)
+        control_kind_label.grid(row=0, column=0, padx=5)
+        
+        control_kind = tk.StringVar(value=Strings.REPEAT)
+        control_kind_combobox = ttk.Combobox(control_frame, textvariable=control_kind, 
+                                            values=[Strings.REPEAT, Strings.REPEAT_END, Strings.LABEL, Strings.GOTO], 
+                                            state="readonly")
+        control_kind_combobox.grid(row=0, column=1, padx=5)
+        
+        control_count_label = ttk.Label(control_frame, text=Strings.REPEAT_COUNT)
+        control_count_label.grid(row=1, column=0, padx=5)
+        
+        control_count = tk.StringVar(value="10")
+        control_count_entry = ttk.Entry(control_frame, textvariable=control_count, width=10)
+        control_count_entry.grid(row=1, column=1, padx=5)
+        
+        control_name_label = ttk.Label(control_frame, text=Strings.LABEL_NAME)
+        control_name_label.grid(row=2, column=0, padx=5)
+        
+        control_name = tk.StringVar(value="a")
+        control_name_entry = ttk.Entry(control_frame, textvariable=control_name, width=10)
+        control_name_entry.grid(row=2, column=1, padx=5)
+        
         # 根据步骤类型显示/隐藏相应框架
+        frames = {Strings.MOUSE: mouse_frame, Strings.KEYBOARD: keyboard_frame,
+                  Strings.DELAY_STEP: delay_frame, Strings.CONTROL_STEP: control_frame}
         def show_hide_frames():
-            if step_type.get() == Strings.MOUSE:
-                mouse_frame.pack(pady=10)
-                keyboard_frame.pack_forget()
-                delay_frame.pack_forget()
-            elif step_type.get() == Strings.KEYBOARD:
-                keyboard_frame.pack(pady=10)
-                mouse_frame.pack_forget()
-                delay_frame.pack_forget()
-            else:  # 延时步骤
-                delay_frame.pack(pady=10)
-                mouse_frame.pack_forget()
-                keyboard_frame.pack_forget()
+            for name, frame in frames.items():
+                if name == step_type.get():
+                    frame.pack(pady=10)
+                else:
+                    frame.pack_forget()
         
         show_hide_frames()
         type_combobox.bind("<<ComboboxSelected>>", lambda e: show_hide_frames())
@@ -514,13 +1050,20 @@ class AutoClicker:
             if step_type.get() == Strings.MOUSE:
                 # 映射按钮文本到值
                 button_map = {Strings.LEFT: "left", Strings.RIGHT: "right", Strings.MIDDLE: "middle"}
-                action_map = {Strings.CLICK: "click", Strings.PRESS: "press", Strings.RELEASE: "release"}
+                action_map = {Strings.CLICK: "click", Strings.PRESS: "press", Strings.RELEASE: "release",
+                              Strings.BURST: "burst"}
                 
-                self.step_manager.add_step({
+                new_step = {
                     "type": "mouse",
                     "button": button_map[mouse_button.get()],
                     "action": action_map[mouse_action.get()]
-                })
+                }
+                if new_step["action"] == "burst":
+                    burst = self.parse_burst(burst_count.get(), burst_cps.get())
+                    if burst is None:
+                        return
+                    new_step.update(burst)
+                self.step_manager.add_step(new_step)
             elif step_type.get() == Strings.KEYBOARD:
                 action_map = {Strings.PRESS: "press", Strings.RELEASE: "release"}
                 
@@ -529,6 +1072,12 @@ class AutoClicker:
                     "key": keyboard_key.get(),
                     "action": action_map[keyboard_action.get()]
                 })
+            elif step_type.get() == Strings.CONTROL_STEP:
+                control_step = self.parse_control_step(control_kind.get(), control_count.get(),
+                                                       control_name.get())
+                if control_step is None:
+                    return
+                self.step_manager.add_step(control_step)
             else:  # 延时步骤
                 try:
                     duration = float(delay_duration.get())
@@ -544,7 +1093,8 @@ class AutoClicker:
                     messagebox.showerror("错误", "请输入有效的数字")
                     return
             
-            self.update_steps_tree()
+            # 列表通过 StepManager 的变更通知自动更新
+            self.step_view.see(len(self.step_manager.steps) - 1)
             window.destroy()
         
         # 按钮框架
@@ -557,28 +1107,73 @@ class AutoClicker:
         cancel_btn = ttk.Button(button_frame, text=Strings.CANCEL, command=window.destroy)
         cancel_btn.grid(row=0, column=1, padx=5)
     
+    def parse_burst(self, count_text, cps_text):
+        """校验连发参数，无效时提示并返回 None"""
+        try:
+            count = int(count_text)
+            cps = float(cps_text)
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的连发次数和速度")
+            return None
+        if count <= 0 or cps <= 0:
+            messagebox.showerror("错误", "连发次数和速度必须大于0")
+            return None
+        return {"count": count, "cps": cps}
+    
+    def parse_control_step(self, kind, count_text, name_text):
+        """校验流程控制步骤参数，无效时提示并返回 None
+
+        块是否配对、标签是否存在在编译时检查，这里只校验单个步骤。
+        """
+        if kind == Strings.REPEAT_END:
+            return {"type": "end"}
+        name = name_text.strip()
+        if kind in (Strings.LABEL, Strings.GOTO) and not name:
+            messagebox.showerror("错误", "请输入标签名")
+            return None
+        if kind == Strings.LABEL:
+            return {"type": "label", "name": name}
+        count_text = count_text.strip()
+        if kind == Strings.GOTO and not count_text:
+            return {"type": "goto", "label": name}
+        try:
+            count = int(count_text)
+        except ValueError:
+            messagebox.showerror("错误", "请输入有效的次数")
+            return None
+        if kind == Strings.GOTO:
+            if count < 0:
+                messagebox.showerror("错误", "跳转次数不能为负数")
+                return None
+            return {"type": "goto", "label": name, "count": count}
+        if count < 1:
+            messagebox.showerror("错误", "重复次数必须大于0")
+            return None
+        return {"type": "repeat", "count": count}
+    
     def edit_step_event(self, event):
         """处理步骤树形视图的双击事件"""
-        selection = self.steps_tree.selection()
-        if selection:
+        if self.step_view.selected_index() is not None:
             self.edit_step()
     
     def edit_step(self):
         """编辑选中的步骤"""
-        selection = self.steps_tree.selection()
-        if not selection:
+        index = self.step_view.selected_index()
+        if index is None:
             messagebox.showwarning("警告", "请先选择一个要编辑的步骤")
             return
         
-        index = self.steps_tree.index(selection[0])
         step = self.step_manager.get_step(index)
         if not step:
             messagebox.showerror("错误", "无法获取步骤信息")
             return
+        if step.get("type") in CONTROL_TYPES:
+            messagebox.showinfo("提示", "流程控制步骤请删除后重新添加")
+            return
         
         window = tk.Toplevel(self.root)
         window.title(Strings.EDIT_STEP)
-        window.geometry("300x300")
+        window.geometry("300x360")
         window.resizable(False, False)
         
         # 步骤类型选择
@@ -609,13 +1204,29 @@ class AutoClicker:
         mouse_action_label.grid(row=1, column=0, padx=5)
         
         # 映射动作值到文本
-        action_reverse_map = {"click": Strings.CLICK, "press": Strings.PRESS, "release": Strings.RELEASE}
+        action_reverse_map = {"click": Strings.CLICK, "press": Strings.PRESS, "release": Strings.RELEASE,
+                              "burst": Strings.BURST}
         mouse_action = tk.StringVar(value=action_reverse_map.get(step.get("action", "click"), Strings.CLICK))
         mouse_action_combobox = ttk.Combobox(mouse_frame, textvariable=mouse_action, 
-                                            values=[Strings.CLICK, Strings.PRESS, Strings.RELEASE], 
+                                            values=[Strings.CLICK, Strings.PRESS, Strings.RELEASE, Strings.BURST], 
                                             state="readonly")
         mouse_action_combobox.grid(row=1, column=1, padx=5)
         
+        # 连发参数，仅在动作为连发时使用
+        burst_count_label = ttk.Label(mouse_frame, text=Strings.BURST_COUNT)
+        burst_count_label.grid(row=2, column=0, padx=5)
+        
+        burst_count = tk.StringVar(value=str(step.get("count", 10)))
+        burst_count_entry = ttk.Entry(mouse_frame, textvariable=burst_count, width=10)
+        burst_count_entry.grid(row=2, column=1, padx=5)
+        
+        burst_cps_label = ttk.Label(mouse_frame, text=Strings.BURST_CPS)
+        burst_cps_label.grid(row=3, column=0, padx=5)
+        
+        burst_cps = tk.StringVar(value=str(step.get("cps", 20)))
+        burst_cps_entry = ttk.Entry(mouse_frame, textvariable=burst_cps, width=10)
+        burst_cps_entry.grid(row=3, column=1, padx=5)
+        
         # 键盘步骤框架
         keyboard_frame = ttk.Frame(window)
         
@@ -624,12 +1235,7 @@ class AutoClicker:
         
         keyboard_key = tk.StringVar(value=step.get("key", "a"))
         keyboard_combobox = ttk.Combobox(keyboard_frame, textvariable=keyboard_key, 
-                                        values=[
-                                            "a", "b", "c", "d", "e", "f", "g", "h", "i", "j", "k", "l", "m", 
-                                            "n", "o", "p", "q", "r", "s", "t", "u", "v", "w", "x", "y", "z",
-                                            "0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
-                                            "esc", "enter", "space", "tab", "shift", "ctrl", "alt"
-                                        ], state="readonly")
+                                        values=KEY_CHOICES, state="readonly")
         keyboard_combobox.grid(row=0, column=1, padx=5)
         
         keyboard_action_label = ttk.Label(keyboard_frame, text=Strings.ACTION)
@@ -673,13 +1279,19 @@ class AutoClicker:
             if step_type.get() == "mouse":
                 # 映射按钮文本到值
                 button_map = {Strings.LEFT: "left", Strings.RIGHT: "right", Strings.MIDDLE: "middle"}
-                action_map = {Strings.CLICK: "click", Strings.PRESS: "press", Strings.RELEASE: "release"}
+                action_map = {Strings.CLICK: "click", Strings.PRESS: "press", Strings.RELEASE: "release",
+                              Strings.BURST: "burst"}
                 
                 updated_step = {
                     "type": "mouse",
                     "button": button_map[mouse_button.get()],
                     "action": action_map[mouse_action.get()]
                 }
+                if updated_step["action"] == "burst":
+                    burst = self.parse_burst(burst_count.get(), burst_cps.get())
+                    if burst is None:
+                        return
+                    updated_step.update(burst)
             elif step_type.get() == "keyboard":
                 action_map = {Strings.PRESS: "press", Strings.RELEASE: "release"}
                 
@@ -704,7 +1316,6 @@ class AutoClicker:
                     return
             
             if self.step_manager.update_step(index, updated_step):
-                self.update_steps_tree()
                 window.destroy()
             else:
                 messagebox.showerror("错误", "更新步骤失败")
@@ -721,25 +1332,23 @@ class AutoClicker:
     
     def remove_step(self):
         """删除选中的步骤"""
-        selection = self.steps_tree.selection()
-        if not selection:
+        index = self.step_view.selected_index()
+        if index is None:
             messagebox.showwarning("警告", "请先选择一个要删除的步骤")
             return
         
-        index = self.steps_tree.index(selection[0])
-        if self.step_manager.remove_step(index) is not None:
-            self.update_steps_tree()
-        else:
+        if self.step_manager.remove_step(index) is None:
             messagebox.showerror("错误", "删除步骤失败")
     
     def clear_steps(self):
         """清空所有步骤"""
         if messagebox.askyesno("确认", "确定要清空所有步骤吗？"):
             self.step_manager.clear()
-            self.update_steps_tree()
     
     def load_config_ui(self):
         """从UI加载配置"""
+        from tkinter import filedialog
+
         filename = filedialog.askopenfilename(
             title="选择配置文件",
             filetypes=[("JSON文件", "*.json"), ("所有文件", "*.*")]
@@ -754,11 +1363,16 @@ class AutoClicker:
                 self.step_delay_var.set(str(self.config['step_delay']))
                 self.loop_delay_var.set(str(self.config['loop_delay']))
                 self.loop_count_var.set(str(self.config['loop_count']))
+                self.countdown_var.set(str(self.config['countdown']))
+                self.target_rate_var.set(str(self.config['target_rate']))
+                self.target_unit_var.set(RATE_UNIT_NAMES.get(self.config['target_unit'], Strings.RATE_APS))
+                self.step_jitter_var.set(str(self.config['step_jitter']))
+                self.loop_jitter_var.set(str(self.config['loop_jitter']))
+                self.jitter_dist_var.set(JITTER_DIST_NAMES.get(self.config['jitter_dist'], Strings.JITTER_UNIFORM))
+                self.schedule_save()
                 
-                # 重新设置监听器
-                if hasattr(self, 'keyboard_listener') and self.keyboard_listener:
-                    self.keyboard_listener.stop()
-                self.setup_listeners()
+                # 只重建快捷键分派表，监听器继续运行
+                self.build_hotkey_table(os.path.dirname(filename))
                 
                 messagebox.showinfo("成功", "配置加载成功")
             except Exception as e:
@@ -767,199 +1381,497 @@ class AutoClicker:
     
     def load_background(self):
         """加载背景图片"""
+        from tkinter import filedialog
+
         filename = filedialog.askopenfilename(
             title="选择背景图片",
             filetypes=[("图片文件", "*.png;*.jpg;*.jpeg;*.gif;*.bmp"), ("所有文件", "*.*")]
         )
         if filename:
-            try:
-                self.config['bg_image'] = filename
-                self.set_background(filename)
-                messagebox.showinfo("成功", "背景图片加载成功")
-            except Exception as e:
-                logger.error(f"加载背景图片失败: {e}")
-                messagebox.showerror("错误", f"加载背景图片失败: {e}")
+            self.config['bg_image'] = filename
+            self.schedule_save()
+            self.set_background(filename, notify=True)
     
     def remove_background(self):
         """移除背景图片"""
         self.config['bg_image'] = None
-        # 移除现有背景
-        if hasattr(self, 'canvas'):
-            self.canvas.destroy()
-        
-        # 重新创建主框架
-        if hasattr(self, 'main_frame'):
-            self.main_frame.destroy()
-        
-        self.create_widgets()
+        self.schedule_save()
+        self.bg_version += 1
+        self.bg_photo = None
+        self.apply_theme()
         messagebox.showinfo("成功", "背景图片已移除")
     
-    def set_background(self, image_path):
-        """设置背景图片"""
+    def apply_theme(self):
+        """按当前背景就地调整画布和主框架，不重建任何控件"""
+        if self.bg_photo is None:
+            if self.bg_item is not None:
+                self.canvas.delete(self.bg_item)
+                self.bg_item = None
+            self.main_frame.config(bg=THEME_PLAIN_BG)
+            self.main_frame.place(x=20, y=20, relwidth=1, relheight=1, width=-40, height=-40,
+                                  relx=0, rely=0, anchor="nw")
+            return
+        x, y = self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2
+        if self.bg_item is None:
+            self.bg_item = self.canvas.create_image(x, y, image=self.bg_photo, anchor="center")
+        else:
+            self.canvas.itemconfig(self.bg_item, image=self.bg_photo)
+        self.main_frame.config(bg=THEME_IMAGE_BG)
+        self.main_frame.place(relx=0.5, rely=0.5, anchor="center", width=700, height=600,
+                              x=0, y=0, relwidth=0, relheight=0)
+    
+    def on_canvas_resize(self, event):
+        """窗口大小变化时保持背景图片居中"""
+        if self.bg_item is not None:
+            self.canvas.coords(self.bg_item, event.width // 2, event.height // 2)
+    
+    def set_background(self, image_path, notify=False):
+        """设置背景图片
+
+        解码和缩放在后台线程中进行，结果缓存在 BG_CACHE_DIR 中，下次启动时直接读取缩略图；
+        界面线程只用 tk.PhotoImage 读入缩放好的 PNG，不保留原图。
+        """
+        self.bg_version += 1
+        version = self.bg_version
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        bounds = background_bounds(screen_width, screen_height)
+
+        def work():
+            try:
+                thumbnail = background_thumbnail(image_path, bounds, screen_width / screen_height)
+            except Exception as e:
+                error = e
+                self.root.after(0, lambda: self.on_background_failed(version, error))
+                return
+            self.root.after(0, lambda: self.apply_background(version, thumbnail, notify))
+
+        threading.Thread(target=work, name="BackgroundImage", daemon=True).start()
+
+    def on_background_failed(self, version, error):
+        """后台加载背景图片失败"""
+        if version != self.bg_version:
+            return
+        logger.error(f"设置背景图片时出错: {error}")
+        messagebox.showerror("错误", f"设置背景图片时出错: {error}")
+        # 恢复无背景的界面
+        self.remove_background()
+
+    def apply_background(self, version, thumbnail, notify):
+        """在界面线程中显示已缩放好的背景图片，过期的结果直接丢弃"""
+        if version != self.bg_version:
+            return
         try:
-            # 移除现有背景
-            if hasattr(self, 'canvas'):
-                self.canvas.destroy()
-            
-            if hasattr(self, 'main_frame'):
-                self.main_frame.destroy()
-            
-            # 加载新背景
-            self.bg_image = Image.open(image_path)
-            
-            # 调整图片大小以适应窗口
-            screen_width = self.root.winfo_screenwidth()
-            screen_height = self.root.winfo_screenheight()
-            
-            img_ratio = self.bg_image.width / self.bg_image.height
-            screen_ratio = screen_width / screen_height
-            
-            if img_ratio > screen_ratio:
-                new_width = min(1000, screen_width - 100)
-                new_height = int(new_width / img_ratio)
-            else:
-                new_height = min(700, screen_height - 100)
-                new_width = int(new_height * img_ratio)
-            
-            self.bg_image = self.bg_image.resize((new_width, new_height), Image.LANCZOS)
-            self.bg_photo = ImageTk.PhotoImage(self.bg_image)
-            
-            # 创建画布作为背景
-            self.canvas = tk.Canvas(self.root, width=new_width, height=new_height, highlightthickness=0)
-            self.canvas.pack(expand=True, fill="both")
-            self.canvas.create_image(new_width//2, new_height//2, image=self.bg_photo, anchor="center")
-            
-            # 创建主框架
-            self.main_frame = tk.Frame(self.canvas, bg="#ffffff", bd=2, relief="raised")
-            self.main_frame.place(relx=0.5, rely=0.5, anchor="center", width=700, height=600)
-            
-            # 重新创建所有控件
-            self.create_widgets()
-            
-        except Exception as e:
-            logger.error(f"设置背景图片时出错: {e}")
-            messagebox.showerror("错误", f"设置背景图片时出错: {e}")
-            # 恢复无背景的界面
-            self.remove_background()
-    
-    def start_autoclicker(self):
-        """开始自动连点"""
-        if not self.step_manager.steps:
+            photo = tk.PhotoImage(file=thumbnail)
+        except tk.TclError as e:
+            self.on_background_failed(version, e)
+            return
+        
+        self.bg_photo = photo
+        self.apply_theme()
+        if notify:
+            messagebox.showinfo("成功", "背景图片加载成功")
+    
+    def start_autoclicker(self, profile=None):
+        """开始自动连点，profile 为 None 时播放步骤列表中的步骤"""
+        if profile is None and not self.step_manager.steps:
             messagebox.showwarning("警告", "请先添加至少一个步骤")
             return
         
         if self.is_running or self.is_counting_down:
             return
-            
+        
+        self.active_profile = profile
+        # 每次开始用新的事件，切换宏时上一次的倒计时仍能看到自己被停止
+        self.stop_event = threading.Event()
         self.is_counting_down = True
         self.start_btn.config(state="disabled")
         self.stop_btn.config(state="normal")
+        self.pause_btn.config(state="normal", text=Strings.PAUSE)
         self.update_status_indicator("准备中", "orange")
         self.current_loop = 0
         
-        self.thread = threading.Thread(target=self.countdown_then_start)
+        # 切换宏时上一次的工作线程可能还没退出，新线程先等它结束
+        self.thread = threading.Thread(target=self.countdown_then_start, args=(self.thread, self.stop_event))
         self.thread.daemon = True
         self.thread.start()
     
-    def countdown_then_start(self):
-        """倒计时然后开始"""
-        for i in range(5, 0, -1):
-            if not self.is_counting_down:
+    def countdown_then_start(self, previous=None, stop_event=None):
+        """倒计时然后开始
+
+        倒计时一开始就创建引擎、编译宏；各秒按绝对时间等待，倒计时结束的时刻直接作为
+        第一个动作的截止时间，第一个动作不会被准备工作推迟。stop_event 被设置时立即结束等待。
+        """
+        stop_event = stop_event or threading.Event()
+        if previous is not None and previous.is_alive():
+            previous.join()
+        seconds = max(0, int(self.config['countdown'] or 0))
+        start_ns = time.monotonic_ns() + seconds * 1_000_000_000
+        engine = self.create_engine()
+        try:
+            engine.prepare()
+        except ValueError as e:
+            logger.error(f"编译步骤失败: {e}")
+            self.is_counting_down = False
+            self.root.after(0, self.on_engine_failed, engine, str(e))
+            return
+        # 准备时间超过倒计时(例如倒计时为0)时从准备完成的时刻开始，否则开头的动作会连续补发
+        start_ns = max(start_ns, time.monotonic_ns())
+
+        for i in range(seconds, 0, -1):
+            if not self.is_counting_down or stop_event.is_set():
                 self.update_status_indicator("已取消", "green")
                 return
                 
             self.update_countdown(f"{i}秒后开始...")
-            time.sleep(1)
+            tick_ns = start_ns - (i - 1) * 1_000_000_000
+            # 停止时立即醒来，不必等完这一秒
+            stop_event.wait(max(0, tick_ns - time.monotonic_ns()) / 1_000_000_000)
         
-        if self.is_counting_down:
+        if self.is_counting_down and not stop_event.is_set():
             self.is_counting_down = False
             self.is_running = True
-            self.update_status_indicator("正在使用", "red")
+            profile = self.active_profile
+            self.update_status_indicator(f"正在使用 {profile.name}" if profile else "正在使用", "red")
             self.update_countdown("")
-            self.run_autoclicker()
+            self.run_autoclicker(engine, start_ns)
     
     def stop_autoclicker(self):
         """停止自动连点"""
         self.is_counting_down = False
         self.is_running = False
+        self.is_resuming = False
+        self.stop_event.set()
+        if self.engine is not None:
+            self.engine.stop()
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
+        self.pause_btn.config(state="disabled", text=Strings.PAUSE)
         self.update_status_indicator("已停止", "green")
         self.update_countdown("")
         self.update_loop_count("")
     
-    def run_autoclicker(self):
-        """执行自动连点"""
-        mouse_controller = mouse.Controller()
-        keyboard_controller = keyboard.Controller()
-        
-        max_loops = self.config['loop_count']
-        current_loop = 0
-        
-        while self.is_running and (max_loops == 0 or current_loop < max_loops):
-            current_loop += 1
-            self.current_loop = current_loop
-            
-            if max_loops > 0:
-                self.update_loop_count(f"循环: {current_loop}/{max_loops}")
-            else:
-                self.update_loop_count(f"循环: {current_loop} (无限)")
-            
-            for step in self.step_manager.steps:
-                if not self.is_running:
-                    break
-                
-                if step["type"] == "mouse":
-                    button = None
-                    if step["button"] == "left":
-                        button = Button.left
-                    elif step["button"] == "right":
-                        button = Button.right
-                    elif step["button"] == "middle":
-                        button = Button.middle
-                    
-                    if step["action"] == "click":
-                        mouse_controller.click(button)
-                    elif step["action"] == "press":
-                        mouse_controller.press(button)
-                    elif step["action"] == "release":
-                        mouse_controller.release(button)
-                
-                elif step["type"] == "keyboard":
-                    key = None
-                    if step["key"] in ["esc", "enter", "space", "tab", "shift", "ctrl", "alt"]:
-                        key = getattr(Key, step["key"])
-                    else:
-                        key = step["key"]
-                    
-                    if step["action"] == "press":
-                        keyboard_controller.press(key)
-                    elif step["action"] == "release":
-                        keyboard_controller.release(key)
-                
-                elif step["type"] == "delay":
-                    time.sleep(step["duration"])
-                    continue  # 跳过步骤间隔延迟
-                
-                time.sleep(self.config['step_delay'])
-            
-            if self.is_running and (max_loops == 0 or current_loop < max_loops):
-                time.sleep(self.config['loop_delay'])
-        
-        # 循环结束后的清理
+    def toggle_pause(self):
+        """暂停或继续正在运行的宏(Tk线程)，暂停时保留当前步骤、轮数和剩余的等待时间"""
+        engine = self.engine
+        if not self.is_running or engine is None or not engine.is_running or self.is_resuming:
+            return
+        if not engine.pausing:
+            engine.pause()
+            self.pause_btn.config(text=Strings.RESUME)
+            self.update_status_indicator("已暂停", "#d4a017")
+            self.update_countdown(f"已暂停，按{self.config['pause_hotkey'].upper()}键继续")
+            return
+
+        seconds = int(self.config['resume_countdown'] or 0)
+        if seconds <= 0:
+            self.resume_engine(engine)
+            return
+        self.is_resuming = True
+        stop_event = self.stop_event
+
+        def countdown():
+            for i in range(seconds, 0, -1):
+                if not self.is_resuming or self.engine is not engine:
+                    return
+                self.update_countdown(f"{i}秒后继续...")
+                if stop_event.wait(1):
+                    return
+            self.root.after(0, self.resume_engine, engine)
+
+        threading.Thread(target=countdown, daemon=True).start()
+
+    def resume_engine(self, engine):
+        """从暂停处继续(Tk线程)"""
+        if engine is not self.engine or not self.is_running:
+            return
+        self.is_resuming = False
+        engine.resume()
+        profile = self.active_profile
+        self.pause_btn.config(text=Strings.PAUSE)
+        self.update_status_indicator(f"正在使用 {profile.name}" if profile else "正在使用", "red")
+        self.update_countdown("")
+
+    def warm_backend(self):
+        """创建输入后端，空闲时提前调用，开始运行时不再等待控制器初始化"""
+        with self.backend_lock:
+            if self.backend is None:
+                from macrotap import PynputBackend
+                self.backend = PynputBackend()
+            return self.backend
+
+    def create_engine(self):
+        """为当前步骤或宏创建引擎(工作线程)"""
+        profile = self.active_profile
+        if profile is None:
+            steps, config, key = self.step_manager.steps, self.config, None
+        else:
+            steps, config, key = profile.steps, profile.engine_config(self.config), profile.key
+        # 后端在多次运行间复用，宏库中的宏再次运行时可以直接使用缓存的编译结果
+        engine = self.engine = MacroEngine(steps, config, backend=self.warm_backend(), timings=self.timings,
+                                           program_cache=self.program_cache, steps_key=key)
+        return engine
+
+    def run_autoclicker(self, engine, start_ns=None):
+        """执行自动连点(工作线程)，第一个动作在 start_ns 时刻发出"""
+        self.status_version = 0
+        self.root.after(0, self.poll_engine_status, engine)
+        error = None
+        if self.is_running:
+            try:
+                engine.run(start_ns)
+            except ValueError as e:
+                logger.error(f"编译步骤失败: {e}")
+                error = str(e)
+
+        # 循环结束后的清理，控件只在Tk线程中修改
         self.is_running = False
+        if error is None:
+            self.root.after(0, self.on_engine_finished, engine)
+        else:
+            self.root.after(0, self.on_engine_failed, engine, error)
+
+    def poll_engine_status(self, engine, expected_ns=None):
+        """按固定频率读取引擎状态槽位并刷新界面(Tk线程)
+
+        引擎只覆盖最新快照，界面每 STATUS_REFRESH_MS 读取一次，
+        无论引擎多快，界面线程的负担都是固定的。每次运行只有一条轮询链，
+        引擎结束或被新的运行替换后链条随之结束。
+        """
+        if engine is not self.engine:
+            return
+        now = time.monotonic_ns()
+        if expected_ns is not None:
+            # 轮询回调相对预定时间的延迟即界面线程的处理延迟
+            self.timings.record_gui_lag(max(0, now - expected_ns))
+        version, status = engine.status.read()
+        if status is not None and version != self.status_version:
+            self.status_version = version
+            self.show_engine_status(status)
+        if engine.is_running:
+            self.root.after(STATUS_REFRESH_MS, self.poll_engine_status, engine,
+                            now + STATUS_REFRESH_MS * 1_000_000)
+
+    def show_engine_status(self, status):
+        """显示一份引擎状态快照"""
+        self.current_loop = status.loop
+        total = f"{status.max_loops}" if status.max_loops > 0 else "(无限)"
+        rate = f"{status.actions_per_sec:.1f}次/秒 {status.loops_per_min:.1f}轮/分"
+        if status.target_rate > 0:
+            rate += f" (目标 {status.target_rate:g}{RATE_UNIT_NAMES[status.target_unit]})"
+            if status.rate_overrun:
+                rate += " 延时超过周期，无法达到目标"
+        paused = " (已暂停)" if status.paused else ""
+        self.loop_count_label.config(
+            text=f"循环: {status.loop}/{total} 步骤: {status.step + 1}{paused} {rate} "
+                 f"偏差 平均{status.late_mean_ms:.2f}ms 最大{status.late_max_ms:.2f}ms"
+        )
+        self.timing_label.config(text=self.timings.summary())
+
+    def on_engine_finished(self, engine):
+        """引擎结束后恢复界面状态"""
+        if engine is not self.engine or self.is_running or self.is_counting_down:
+            # 已经切换到另一个宏
+            return
         self.start_btn.config(state="normal")
         self.stop_btn.config(state="disabled")
+        self.pause_btn.config(state="disabled", text=Strings.PAUSE)
         self.update_status_indicator("已完成", "green")
-        self.update_loop_count("")
+        self.loop_count_label.config(text="")
+        self.timing_label.config(text=self.timings.summary())
+
+    def on_engine_failed(self, engine, message):
+        """宏步骤无效(如 repeat/end 不匹配、标签不存在)时恢复界面并提示错误"""
+        if engine is not self.engine or self.is_running or self.is_counting_down:
+            return
+        self.start_btn.config(state="normal")
+        self.stop_btn.config(state="disabled")
+        self.pause_btn.config(state="disabled", text=Strings.PAUSE)
+        self.update_status_indicator("步骤无效", "green")
+        self.update_countdown("")
+        self.loop_count_label.config(text="")
+        messagebox.showerror("错误", f"宏步骤无效，无法开始:\n{message}")
     
+    def open_library_window(self):
+        """宏库窗口: 只读取索引，选中的宏在载入或运行时才读取文件"""
+        from tkinter import simpledialog
+
+        if self.library is None:
+            try:
+                self.library = MacroLibrary(self.config['library_dir'])
+            except Exception as e:
+                logger.error(f"打开宏库失败: {e}")
+                messagebox.showerror("错误", f"打开宏库失败: {e}")
+                return
+        library = self.library
+
+        window = tk.Toplevel(self.root)
+        window.title(Strings.LIBRARY)
+        window.geometry("520x360")
+
+        search_var = tk.StringVar()
+        search_entry = ttk.Entry(window, textvariable=search_var)
+        search_entry.pack(fill="x", padx=10, pady=5)
+
+        tree = ttk.Treeview(window, columns=("名称", "标签", "步骤数"), show="headings", height=10)
+        for column, width in (("名称", 200), ("标签", 200), ("步骤数", 80)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        tree.pack(fill="both", expand=True, padx=10)
+
+        def fill():
+            tree.delete(*tree.get_children())
+            for entry in library.find(text=search_var.get().strip()):
+                tree.insert("", "end", iid=entry.filename,
+                            values=(entry.name, ",".join(entry.tags), entry.step_count))
+
+        def selected():
+            selection = tree.selection()
+            if not selection:
+                messagebox.showwarning("警告", "请先选择一个宏", parent=window)
+                return None
+            return selection[0]
+
+        def load_selected():
+            filename = selected()
+            if filename is None:
+                return
+            try:
+                self.step_manager.set_steps(library.load(filename))
+            except ValueError as e:
+                messagebox.showerror("错误", str(e), parent=window)
+
+        def run_selected():
+            filename = selected()
+            if filename is None:
+                return
+            try:
+                entry = library.get(filename)
+                profile = MacroProfile(entry.name, "", library.load(filename), key=entry.hash)
+            except ValueError as e:
+                messagebox.showerror("错误", str(e), parent=window)
+                return
+            self.start_autoclicker(profile)
+
+        def save_current():
+            if not self.step_manager.steps:
+                messagebox.showwarning("警告", "当前没有步骤", parent=window)
+                return
+            name = simpledialog.askstring(Strings.LIBRARY_SAVE, "宏名称:", parent=window)
+            if not name:
+                return
+            try:
+                library.save(name.strip(), list(self.step_manager.steps))
+            except ValueError as e:
+                messagebox.showerror("错误", str(e), parent=window)
+                return
+            fill()
+
+        def edit_tags():
+            filename = selected()
+            if filename is None:
+                return
+            current = ",".join(library.get(filename).tags)
+            text = simpledialog.askstring(Strings.LIBRARY_TAGS, "标签(逗号分隔):", initialvalue=current, parent=window)
+            if text is not None:
+                library.set_tags(filename, [tag.strip() for tag in text.split(",") if tag.strip()])
+                fill()
+
+        def delete_selected():
+            filename = selected()
+            if filename is not None and messagebox.askyesno("确认", f"确定要删除 {filename} 吗？", parent=window):
+                library.delete(filename)
+                fill()
+
+        def refresh():
+            try:
+                library.refresh()
+            except OSError as e:
+                messagebox.showerror("错误", f"刷新宏库失败: {e}", parent=window)
+            fill()
+
+        button_frame = ttk.Frame(window)
+        button_frame.pack(pady=5)
+        for column, (text, command) in enumerate((
+            (Strings.LIBRARY_LOAD, load_selected),
+            (Strings.LIBRARY_RUN, run_selected),
+            (Strings.LIBRARY_SAVE, save_current),
+            (Strings.LIBRARY_TAGS, edit_tags),
+            (Strings.LIBRARY_DELETE, delete_selected),
+            (Strings.LIBRARY_REFRESH, refresh),
+        )):
+            ttk.Button(button_frame, text=text, command=command).grid(row=0, column=column, padx=2)
+
+        search_entry.bind("<KeyRelease>", lambda e: fill())
+        tree.bind("<Double-1>", lambda e: load_selected())
+        # 只比较文件的修改时间和大小，未变化的宏不会被解析
+        refresh()
+
+    def toggle_recording(self, from_button=False):
+        """开始或停止录制真实输入，from_button 表示由录制按钮(鼠标左键)触发"""
+        if self.recorder.is_recording:
+            self.recorder.stop()
+            steps = self.recorder.to_steps(
+                step_delay=self.config['step_delay'],
+                ignore_keys=[self.config['record_hotkey']],
+                # 点击停止按钮的那一下不属于录制内容
+                stop_button="left" if from_button else None
+            )
+            for step in steps:
+                self.step_manager.add_step(step)
+            self.record_btn.config(text=Strings.RECORD)
+            self.start_btn.config(state="normal")
+            self.update_status_indicator("尚未使用", "green")
+            messagebox.showinfo("成功", f"录制完成，添加了 {len(steps)} 个步骤")
+            return
+
+        if self.is_running or self.is_counting_down:
+            return
+        try:
+            self.recorder.start()
+        except Exception as e:
+            logger.error(f"开始录制失败: {e}")
+            messagebox.showerror("错误", f"开始录制失败: {e}")
+            return
+        self.record_btn.config(text=Strings.STOP_RECORD)
+        self.start_btn.config(state="disabled")
+        self.update_status_indicator("录制中", "purple")
+
     def on_key_press(self, key):
-        """键盘按键事件处理"""
-        if key in self.start_hotkey and not self.is_running and not self.is_counting_down:
+        """键盘按键事件处理(监听线程)，每次按键只查一次分派表"""
+        action = self.hotkeys.press(key_name(key))
+        if action is None:
+            return
+        kind, profile = action
+        busy = self.is_running or self.is_counting_down
+
+        if kind == "record":
+            if not busy:
+                self.root.after(0, self.toggle_recording)
+            return
+
+        # 录制期间按键都作为录制内容，不触发开始/停止
+        if self.recorder.is_recording:
+            return
+
+        if kind == "start" and not busy:
             self.start_autoclicker()
-        
-        if key in self.stop_hotkeys and (self.is_running or self.is_counting_down):
+        elif kind == "pause" or (kind == "start" and self.engine is not None and self.engine.pausing):
+            # 暂停中再按开始键也是继续
+            self.root.after(0, self.toggle_pause)
+        elif kind == "stop" and busy:
             self.stop_autoclicker()
+        elif kind == "profile":
+            # 再按一次正在运行的宏的快捷键停止它，按其他宏的快捷键直接切换
+            switching = busy and self.active_profile is not profile
+            if busy:
+                self.stop_autoclicker()
+            if switching or not busy:
+                self.start_autoclicker(profile)
+    
+    def on_key_release(self, key):
+        """键盘释放事件，只用于跟踪修饰键"""
+        self.hotkeys.release(key_name(key))
     
     def update_countdown(self, text):
         """更新倒计时显示"""
@@ -973,6 +1885,26 @@ class AutoClicker:
             self.loop_count_label.config(text=text)
         self.root.after(0, update)
 
+    def export_timings(self):
+        """导出逐步骤时序原始数据"""
+        from tkinter import filedialog
+
+        if not self.timings.count:
+            messagebox.showwarning("警告", "还没有时序数据，请先运行一次")
+            return
+        filename = filedialog.asksaveasfilename(
+            title=Strings.EXPORT_TIMINGS,
+            defaultextension=".csv",
+            filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")]
+        )
+        if filename:
+            try:
+                rows = self.timings.export_csv(filename)
+                messagebox.showinfo("成功", f"已导出 {rows} 条时序数据")
+            except Exception as e:
+                logger.error(f"导出时序数据失败: {e}")
+                messagebox.showerror("错误", f"导出时序数据失败: {e}")
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = AutoClicker(root)
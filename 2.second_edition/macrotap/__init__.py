@@ -0,0 +1,65 @@
+"""MacroTap 无界面宏引擎
+
+不依赖 tkinter 和 PIL，可在无显示器的环境或脚本中播放步骤:
+
+    python -m macrotap run steps.json --loops N
+"""
+from .steps import StepManager, dump_steps
+from .persist import BackgroundWriter, atomic_write
+from .backends import InputBackend, PynputBackend, NullBackend, RecordingBackend, create_backend
+from .compiler import CONTROL_TYPES, ProgramCache, compile_program, compile_steps
+from .scheduler import DeadlineScheduler, seconds_to_ns
+from .engine import MacroEngine, DEFAULT_CONFIG, RATE_UNITS
+from .jitter import JitterSchedule, JITTER_DISTRIBUTIONS
+from .metrics import LogHistogram, StepTimings
+from .recorder import MacroRecorder, events_to_steps, key_name
+from .binfmt import BinaryMacro, load_binary, save_binary
+from .stream import MacroStream
+from .status import EngineStatus, StatusSlot
+from .timeline import Track, TimelineEngine, load_timeline, save_timeline
+from .hotkeys import HotkeyTable, MacroProfile, load_profiles, parse_chord
+from .library import MacroEntry, MacroLibrary
+
+__all__ = [
+    "StepManager",
+    "dump_steps",
+    "BackgroundWriter",
+    "atomic_write",
+    "InputBackend",
+    "PynputBackend",
+    "NullBackend",
+    "RecordingBackend",
+    "create_backend",
+    "compile_program",
+    "compile_steps",
+    "CONTROL_TYPES",
+    "ProgramCache",
+    "DeadlineScheduler",
+    "seconds_to_ns",
+    "MacroEngine",
+    "DEFAULT_CONFIG",
+    "RATE_UNITS",
+    "JitterSchedule",
+    "JITTER_DISTRIBUTIONS",
+    "LogHistogram",
+    "StepTimings",
+    "MacroRecorder",
+    "events_to_steps",
+    "key_name",
+    "BinaryMacro",
+    "load_binary",
+    "save_binary",
+    "MacroStream",
+    "EngineStatus",
+    "StatusSlot",
+    "Track",
+    "TimelineEngine",
+    "load_timeline",
+    "save_timeline",
+    "HotkeyTable",
+    "MacroProfile",
+    "load_profiles",
+    "parse_chord",
+    "MacroEntry",
+    "MacroLibrary",
+]
@@ -0,0 +1,250 @@
+import time
+from array import array
+from typing import Any, Callable, List, Optional, Tuple
+
+# 键盘特殊键名称，其余按键按字符处理
+SPECIAL_KEY_NAMES = ("esc", "enter", "space", "tab", "shift", "ctrl", "alt")
+MOUSE_BUTTON_NAMES = ("left", "right", "middle")
+
+class InputBackend:
+    """输入后端接口
+
+    编译阶段通过 resolve_button/resolve_key 把名称解析成后端自己的对象，
+    播放阶段只调用 press_button 等方法，不再做任何查找。
+    """
+    name = "base"
+
+    def resolve_button(self, name: str) -> Any:
+        """鼠标按钮名称 -> 后端按钮对象，无效时抛出 ValueError"""
+        if name not in MOUSE_BUTTON_NAMES:
+            raise ValueError(f"未知鼠标按钮: {name}")
+        return name
+
+    def resolve_key(self, name: str) -> Any:
+        """按键名称 -> 后端按键对象，无效时抛出 ValueError"""
+        if not name:
+            raise ValueError("按键不能为空")
+        return name
+
+    def press_button(self, button: Any) -> None:
+        """按下鼠标按钮"""
+        raise NotImplementedError
+
+    def release_button(self, button: Any) -> None:
+        """释放鼠标按钮"""
+        raise NotImplementedError
+
+    def click(self, button: Any) -> None:
+        """单击鼠标按钮"""
+        raise NotImplementedError
+
+    def click_many(self, batch: Tuple[Any, int]) -> None:
+        """连续单击 (按钮, 次数)，默认逐次调用 click，后端可覆盖为批量发送"""
+        button, count = batch
+        for _ in range(count):
+            self.click(button)
+
+    def press_key(self, key: Any) -> None:
+        """按下按键"""
+        raise NotImplementedError
+
+    def release_key(self, key: Any) -> None:
+        """释放按键"""
+        raise NotImplementedError
+
+    def move(self, position: Tuple[int, int]) -> None:
+        """移动鼠标到绝对坐标"""
+        raise NotImplementedError
+
+    def type(self, text: str) -> None:
+        """输入一段文本"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """释放后端资源"""
+
+class PynputBackend(InputBackend):
+    """默认后端，通过 pynput 向系统注入输入，需要显示器"""
+    name = "pynput"
+
+    def __init__(self):
+        from pynput import mouse, keyboard
+        from pynput.mouse import Button
+        from pynput.keyboard import Key
+
+        self.mouse_controller = mouse.Controller()
+        self.keyboard_controller = keyboard.Controller()
+        self.buttons = {name: getattr(Button, name) for name in MOUSE_BUTTON_NAMES}
+        self.special_keys = {name: getattr(Key, name) for name in SPECIAL_KEY_NAMES}
+        self.key_class = Key
+
+        # 直接绑定控制器方法，播放时少一层调用
+        self.press_button = self.mouse_controller.press
+        self.release_button = self.mouse_controller.release
+        self.click = self.mouse_controller.click
+        self.press_key = self.keyboard_controller.press
+        self.release_key = self.keyboard_controller.release
+        self.type = self.keyboard_controller.type
+        self._xtest = self._bind_xtest()
+
+    def _bind_xtest(self) -> Optional[Tuple[Callable, Any, int, int]]:
+        """Xorg 下返回 (fake_input, display, ButtonPress, ButtonRelease)，其他平台返回 None"""
+        display = getattr(self.mouse_controller, "_display", None)
+        if display is None:
+            return None
+        try:
+            from Xlib import X
+            from Xlib.ext import xtest
+        except ImportError:
+            return None
+        return xtest.fake_input, display, X.ButtonPress, X.ButtonRelease
+
+    def resolve_button(self, name: str) -> Any:
+        if name not in self.buttons:
+            raise ValueError(f"未知鼠标按钮: {name}")
+        return self.buttons[name]
+
+    def resolve_key(self, name: str) -> Any:
+        if not name:
+            raise ValueError("按键不能为空")
+        if name in self.special_keys:
+            return self.special_keys[name]
+        if len(name) > 1:
+            # 录制得到的 f1、up 等其他特殊键
+            key = getattr(self.key_class, name, None)
+            if key is None:
+                raise ValueError(f"未知按键: {name}")
+            return key
+        return name
+
+    def move(self, position: Tuple[int, int]) -> None:
+        self.mouse_controller.position = position
+
+    def click_many(self, batch: Tuple[Any, int]) -> None:
+        button, count = batch
+        if self._xtest is None:
+            self.mouse_controller.click(button, count)
+            return
+        # pynput 每个事件都单独 sync 一次，这里整批写入后只 sync 一次
+        fake_input, display, press, release = self._xtest
+        code = button.value
+        for _ in range(count):
+            fake_input(display, press, code)
+            fake_input(display, release, code)
+        display.sync()
+
+def _noop(arg: Any) -> None:
+    """空操作"""
+
+class NullBackend(InputBackend):
+    """丢弃所有输入的后端，用于测量引擎自身的开销"""
+    name = "null"
+
+    press_button = staticmethod(_noop)
+    release_button = staticmethod(_noop)
+    click = staticmethod(_noop)
+    click_many = staticmethod(_noop)
+    press_key = staticmethod(_noop)
+    release_key = staticmethod(_noop)
+    move = staticmethod(_noop)
+    type = staticmethod(_noop)
+
+# RecordingBackend 事件操作码
+OP_PRESS_BUTTON = 1
+OP_RELEASE_BUTTON = 2
+OP_CLICK = 3
+OP_PRESS_KEY = 4
+OP_RELEASE_KEY = 5
+OP_MOVE = 6
+OP_TYPE = 7
+OP_NAMES = {
+    OP_PRESS_BUTTON: "press_button",
+    OP_RELEASE_BUTTON: "release_button",
+    OP_CLICK: "click",
+    OP_PRESS_KEY: "press_key",
+    OP_RELEASE_KEY: "release_key",
+    OP_MOVE: "move",
+    OP_TYPE: "type",
+}
+
+class RecordingBackend(InputBackend):
+    """只在内存中记录事件的后端，不需要 X 服务器
+
+    事件写入预先分配的环形缓冲区(时间戳、操作码、参数)，记录时不分配新列表；
+    超出容量后覆盖最旧的事件，dropped 记录被覆盖的数量。
+    """
+    name = "record"
+
+    def __init__(self, capacity: int = 65536):
+        if capacity <= 0:
+            raise ValueError("缓冲区容量必须大于0")
+        self.capacity = capacity
+        self.timestamps = array('q', bytes(8 * capacity))
+        self.opcodes = array('B', bytes(capacity))
+        self.args: List[Any] = [None] * capacity
+        self.count = 0
+
+    @property
+    def dropped(self) -> int:
+        """被覆盖的事件数"""
+        return max(0, self.count - self.capacity)
+
+    def _record(self, opcode: int, arg: Any) -> None:
+        i = self.count % self.capacity
+        self.timestamps[i] = time.monotonic_ns()
+        self.opcodes[i] = opcode
+        self.args[i] = arg
+        self.count += 1
+
+    def press_button(self, button: Any) -> None:
+        self._record(OP_PRESS_BUTTON, button)
+
+    def release_button(self, button: Any) -> None:
+        self._record(OP_RELEASE_BUTTON, button)
+
+    def click(self, button: Any) -> None:
+        self._record(OP_CLICK, button)
+
+    def click_many(self, batch: Tuple[Any, int]) -> None:
+        button, count = batch
+        for _ in range(count):
+            self._record(OP_CLICK, button)
+
+    def press_key(self, key: Any) -> None:
+        self._record(OP_PRESS_KEY, key)
+
+    def release_key(self, key: Any) -> None:
+        self._record(OP_RELEASE_KEY, key)
+
+    def move(self, position: Tuple[int, int]) -> None:
+        self._record(OP_MOVE, position)
+
+    def type(self, text: str) -> None:
+        self._record(OP_TYPE, text)
+
+    def clear(self) -> None:
+        """清空已记录的事件"""
+        self.count = 0
+
+    def events(self) -> List[Tuple[int, str, Any]]:
+        """按时间顺序返回 (时间戳纳秒, 操作名, 参数) 列表"""
+        size = min(self.count, self.capacity)
+        first = self.count - size
+        result = []
+        for n in range(first, self.count):
+            i = n % self.capacity
+            result.append((self.timestamps[i], OP_NAMES[self.opcodes[i]], self.args[i]))
+        return result
+
+# 命令行等场景按名称选择后端
+BACKENDS = {
+    PynputBackend.name: PynputBackend,
+    NullBackend.name: NullBackend,
+    RecordingBackend.name: RecordingBackend,
+}
+
+def create_backend(name: str) -> InputBackend:
+    """按名称创建后端"""
+    if name not in BACKENDS:
+        raise ValueError(f"未知输入后端: {name}")
+    return BACKENDS[name]()
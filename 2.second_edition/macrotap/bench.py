@@ -0,0 +1,162 @@
+import json
+import logging
+import platform
+import threading
+import time
+from array import array
+from typing import List, Dict, Any, Optional, Sequence
+
+from .backends import NullBackend
+from .engine import MacroEngine
+from .scheduler import DeadlineScheduler
+
+logger = logging.getLogger("AutoClicker")
+
+BENCH_FORMAT_VERSION = 1
+DEFAULT_SIZES = (3, 100, 10_000, 100_000)
+DEFAULT_DELAYS = (0.0, 0.001, 0.05, 0.5)
+# 测量停止延迟的次数，以及每次调用 stop() 前让引擎进入等待的时间(秒)
+STOP_SAMPLES = 20
+STOP_SETTLE = 0.02
+
+# 合成宏的步骤模式
+SYNTHETIC_PATTERN = (
+    {"type": "mouse", "button": "left", "action": "click"},
+    {"type": "keyboard", "key": "a", "action": "press"},
+    {"type": "keyboard", "key": "a", "action": "release"},
+)
+
+def synthetic_steps(size: int) -> List[Dict[str, Any]]:
+    """生成指定长度的合成步骤列表"""
+    return [dict(SYNTHETIC_PATTERN[i % len(SYNTHETIC_PATTERN)]) for i in range(size)]
+
+def percentile(sorted_values: Sequence[int], q: float) -> int:
+    """已排序序列的分位数(最近秩)"""
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+class BenchScheduler(DeadlineScheduler):
+    """记录每个动作迟到时间的调度器，执行 limit 个动作后停止引擎
+
+    迟到样本写入预先分配的数组；两次 wait 之间的时间计为引擎的每步开销。
+    """
+    def __init__(self, limit: int, **kwargs):
+        super().__init__(**kwargs)
+        self.limit = limit
+        self.samples = array('q', bytes(8 * (limit + 1)))
+        self.engine: Optional[MacroEngine] = None
+
+    def start(self, at_ns: Optional[int] = None) -> None:
+        super().start(at_ns)
+        self.busy_ns = 0
+        self.started_ns = self.deadline
+        self.last_return_ns = 0
+
+    def wait(self) -> Optional[int]:
+        entered = time.monotonic_ns()
+        if self.last_return_ns:
+            self.busy_ns += entered - self.last_return_ns
+        late = super().wait()
+        if late is None:
+            return None
+        self.samples[self.count - 1] = late
+        if self.count > self.limit and self.engine is not None:
+            self.engine.stop()
+        self.last_return_ns = time.monotonic_ns()
+        return late
+
+def run_case(size: int, delay: float, budget: float = 2.0, min_actions: int = 1000) -> Dict[str, Any]:
+    """运行一组 (步骤数, 间隔) 的基准测试
+
+    步骤间隔和循环间隔都取 delay；有间隔时动作数受 budget 秒限制，
+    步骤太少时循环播放直到 min_actions 个动作。间隔为0时所有动作的计划时间相同，
+    迟到时间即为累计耗时，此时应主要看吞吐和每步开销。
+    """
+    actions = max(size, min_actions)
+    if delay > 0:
+        actions = min(actions, int(budget / delay))
+    actions = max(actions, 3)
+
+    scheduler = BenchScheduler(actions)
+    config = {'step_delay': delay, 'loop_delay': delay, 'loop_count': 0}
+    engine = MacroEngine(synthetic_steps(size), config, backend=NullBackend(), scheduler=scheduler)
+    scheduler.engine = engine
+    engine.run()
+
+    executed = min(scheduler.count, actions)
+    elapsed_ns = scheduler.last_return_ns - scheduler.started_ns
+    late = sorted(scheduler.samples[:executed])
+    return {
+        "steps": size,
+        "delay": delay,
+        "actions": executed,
+        "elapsed_s": elapsed_ns / 1e9,
+        "actions_per_sec": executed / (elapsed_ns / 1e9) if elapsed_ns else 0.0,
+        "overhead_us": scheduler.busy_ns / max(1, executed - 1) / 1000,
+        "late_p50_us": percentile(late, 0.50) / 1000,
+        "late_p99_us": percentile(late, 0.99) / 1000,
+        "late_max_us": (late[-1] if late else 0) / 1000,
+    }
+
+def measure_stop_latency(samples: int = STOP_SAMPLES, settle: float = STOP_SETTLE) -> Dict[str, Any]:
+    """测量从 stop() 到 run() 返回的时间
+
+    引擎交替停在 60 秒的延时步骤和 3600 秒的循环间隔上，stop() 应立即打断等待。
+    """
+    cases = (
+        ([{"type": "delay", "duration": 60.0}], {'loop_delay': 0.0}),
+        ([dict(SYNTHETIC_PATTERN[0])], {'step_delay': 0.0, 'loop_delay': 3600.0}),
+    )
+    latencies = []
+    for i in range(samples):
+        steps, config = cases[i % len(cases)]
+        engine = MacroEngine(steps, dict(config, loop_count=0), backend=NullBackend())
+        returned = []
+        thread = threading.Thread(target=lambda: (engine.run(), returned.append(time.monotonic_ns())))
+        thread.start()
+        time.sleep(settle)
+        stopped = time.monotonic_ns()
+        engine.stop()
+        thread.join()
+        latencies.append(returned[0] - stopped)
+    latencies.sort()
+    return {
+        "samples": len(latencies),
+        "stop_p50_us": percentile(latencies, 0.50) / 1000,
+        "stop_p99_us": percentile(latencies, 0.99) / 1000,
+        "stop_max_us": (latencies[-1] if latencies else 0) / 1000,
+    }
+
+def run_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES, delays: Sequence[float] = DEFAULT_DELAYS,
+                   budget: float = 2.0) -> Dict[str, Any]:
+    """运行全部组合，返回可直接保存为 JSON 的结果"""
+    results = []
+    for size in sizes:
+        for delay in delays:
+            result = run_case(size, delay, budget)
+            logger.info(
+                f"步骤 {size:>6} 间隔 {delay:<6} 动作 {result['actions']:>6} "
+                f"{result['actions_per_sec']:>10.0f}/s 开销 {result['overhead_us']:.2f}us "
+                f"迟到 p50 {result['late_p50_us']:.1f}us p99 {result['late_p99_us']:.1f}us "
+                f"max {result['late_max_us']:.1f}us"
+            )
+            results.append(result)
+    stop_latency = measure_stop_latency()
+    logger.info(
+        f"停止延迟 p50 {stop_latency['stop_p50_us']:.1f}us p99 {stop_latency['stop_p99_us']:.1f}us "
+        f"max {stop_latency['stop_max_us']:.1f}us"
+    )
+    return {
+        "version": BENCH_FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+        "stop_latency": stop_latency,
+    }
+
+def save_results(report: Dict[str, Any], filename: str) -> None:
+    """保存基准测试结果"""
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,220 @@
+"""紧凑的二进制宏文件格式 (.mtap)
+
+文件结构:
+    头部  <4sBBHII  魔数 b"MTAP"、版本、压缩方式、保留、记录数、字符串表字节数
+    数据  字符串表(以 \\0 分隔的 UTF-8) + 定长记录，可整体用 zlib/lzma 压缩
+
+每条记录 <BxHq 共 12 字节: 操作码、参数、延时字段。参数对鼠标是按钮序号，对键盘、
+坐标、文本和连发参数("按钮,次数,速度")是字符串表序号；延时字段保存的是本条与上一条延时(微秒)的差值，
+节奏规律的宏差值多为 0，压缩率更高。未压缩的文件通过 mmap 按需解析。
+"""
+import lzma
+import mmap
+import struct
+import zlib
+from typing import List, Dict, Any, Iterator, Tuple
+
+from .backends import MOUSE_BUTTON_NAMES
+from .persist import atomic_write
+
+MAGIC = b"MTAP"
+BINARY_SUFFIX = ".mtap"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+RECORD = struct.Struct("<BxHq")
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_LZMA = 2
+COMPRESSIONS = {"none": COMPRESS_NONE, "zlib": COMPRESS_ZLIB, "lzma": COMPRESS_LZMA}
+
+# 操作码
+OP_MOUSE_CLICK = 1
+OP_MOUSE_PRESS = 2
+OP_MOUSE_RELEASE = 3
+OP_MOUSE_MOVE = 4
+OP_KEY_PRESS = 5
+OP_KEY_RELEASE = 6
+OP_KEY_TYPE = 7
+OP_DELAY = 8
+OP_MOUSE_BURST = 9
+
+MOUSE_OPCODES = {"click": OP_MOUSE_CLICK, "press": OP_MOUSE_PRESS, "release": OP_MOUSE_RELEASE}
+KEY_OPCODES = {"press": OP_KEY_PRESS, "release": OP_KEY_RELEASE}
+OPCODE_ACTIONS = {
+    OP_MOUSE_CLICK: "click",
+    OP_MOUSE_PRESS: "press",
+    OP_MOUSE_RELEASE: "release",
+    OP_KEY_PRESS: "press",
+    OP_KEY_RELEASE: "release",
+}
+
+# (操作码, 参数, 延时微秒)
+Record = Tuple[int, int, int]
+
+def is_binary_macro(filename: str) -> bool:
+    """根据魔数判断是否为二进制宏文件"""
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+def encode_steps(steps: List[Dict[str, Any]]) -> Tuple[List[str], List[Record]]:
+    """步骤列表 -> (字符串表, 记录列表)，延时为绝对微秒值"""
+    strings: List[str] = []
+    string_index: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        if text not in string_index:
+            if "\0" in text:
+                raise ValueError(f"字符串不能包含 \\0: {text!r}")
+            string_index[text] = len(strings)
+            strings.append(text)
+        return string_index[text]
+
+    records: List[Record] = []
+    for i, step in enumerate(steps):
+        step_type = step.get("type")
+        action = step.get("action")
+        if step_type == "mouse" and action == "burst" and step.get("button") in MOUSE_BUTTON_NAMES:
+            burst = f"{step['button']},{int(step['count'])},{float(step['cps'])!r}"
+            records.append((OP_MOUSE_BURST, intern(burst), 0))
+        elif step_type == "mouse" and action == "move":
+            records.append((OP_MOUSE_MOVE, intern(f"{int(step['x'])},{int(step['y'])}"), 0))
+        elif step_type == "mouse" and action in MOUSE_OPCODES and step.get("button") in MOUSE_BUTTON_NAMES:
+            records.append((MOUSE_OPCODES[action], MOUSE_BUTTON_NAMES.index(step["button"]), 0))
+        elif step_type == "keyboard" and action == "type":
+            records.append((OP_KEY_TYPE, intern(str(step["text"])), 0))
+        elif step_type == "keyboard" and action in KEY_OPCODES and step.get("key"):
+            records.append((KEY_OPCODES[action], intern(step["key"]), 0))
+        elif step_type == "delay":
+            records.append((OP_DELAY, 0, int(round(float(step["duration"]) * 1_000_000))))
+        else:
+            raise ValueError(f"第{i+1}步无法编码: {step}")
+    if len(strings) > 0xFFFF:
+        raise ValueError("不同的按键/文本过多，超出字符串表容量")
+    return strings, records
+
+def decode_record(record: Record, strings: List[str]) -> Dict[str, Any]:
+    """单条记录 -> 步骤字典"""
+    opcode, arg, delay_us = record
+    if opcode in (OP_MOUSE_CLICK, OP_MOUSE_PRESS, OP_MOUSE_RELEASE):
+        return {"type": "mouse", "button": MOUSE_BUTTON_NAMES[arg], "action": OPCODE_ACTIONS[opcode]}
+    if opcode in (OP_KEY_PRESS, OP_KEY_RELEASE):
+        return {"type": "keyboard", "key": strings[arg], "action": OPCODE_ACTIONS[opcode]}
+    if opcode == OP_DELAY:
+        return {"type": "delay", "duration": delay_us / 1_000_000}
+    if opcode == OP_MOUSE_MOVE:
+        x, y = strings[arg].split(",")
+        return {"type": "mouse", "action": "move", "x": int(x), "y": int(y)}
+    if opcode == OP_KEY_TYPE:
+        return {"type": "keyboard", "action": "type", "text": strings[arg]}
+    if opcode == OP_MOUSE_BURST:
+        button, count, cps = strings[arg].split(",")
+        return {"type": "mouse", "button": button, "action": "burst", "count": int(count), "cps": float(cps)}
+    raise ValueError(f"未知操作码: {opcode}")
+
+def save_binary(steps: List[Dict[str, Any]], filename: str, compression: str = "none") -> None:
+    """保存为二进制宏文件，先写临时文件再替换"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"未知压缩方式: {compression}")
+    strings, records = encode_steps(steps)
+    strtab = "\0".join(strings).encode("utf-8")
+
+    body = bytearray(strtab)
+    previous = 0
+    for opcode, arg, delay_us in records:
+        body += RECORD.pack(opcode, arg, delay_us - previous)
+        previous = delay_us
+
+    method = COMPRESSIONS[compression]
+    if method == COMPRESS_ZLIB:
+        body = zlib.compress(bytes(body), 9)
+    elif method == COMPRESS_LZMA:
+        body = lzma.compress(bytes(body))
+
+    atomic_write(filename, HEADER.pack(MAGIC, FORMAT_VERSION, method, 0, len(records), len(strtab)) + body)
+
+class BinaryMacro:
+    """只读的二进制宏文件
+
+    未压缩时数据直接来自 mmap，迭代时逐条解析记录，不会一次性展开所有步骤；
+    压缩文件需要先整体解压到内存。
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        self._file = open(filename, 'rb')
+        self._mmap = None
+        self._records = None
+        try:
+            header = self._file.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError("文件太短，不是有效的二进制宏文件")
+            magic, version, method, _, self.count, strtab_len = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError("魔数不匹配，不是二进制宏文件")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"不支持的文件版本: {version}")
+            self.compression = method
+
+            if method == COMPRESS_NONE:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(self._mmap)[HEADER.size:]
+            elif method == COMPRESS_ZLIB:
+                data = memoryview(zlib.decompress(self._file.read()))
+            elif method == COMPRESS_LZMA:
+                data = memoryview(lzma.decompress(self._file.read()))
+            else:
+                raise ValueError(f"未知压缩方式: {method}")
+
+            if len(data) != strtab_len + self.count * RECORD.size:
+                raise ValueError("文件长度与头部记录数不符")
+            strtab = bytes(data[:strtab_len]).decode("utf-8")
+            self.strings = strtab.split("\0") if strtab_len else []
+            self._records = data[strtab_len:]
+        except Exception:
+            self.close()
+            raise
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __enter__(self) -> "BinaryMacro":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def records(self) -> Iterator[Record]:
+        """逐条返回 (操作码, 参数, 延时微秒)，延时已还原为绝对值"""
+        delay_us = 0
+        for opcode, arg, delta in RECORD.iter_unpack(self._records):
+            delay_us += delta
+            yield opcode, arg, delay_us
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        strings = self.strings
+        for record in self.records():
+            yield decode_record(record, strings)
+
+    def close(self) -> None:
+        """释放 mmap 和文件句柄"""
+        try:
+            if self._records is not None:
+                self._records.release()
+            if self._mmap is not None:
+                self._mmap.close()
+        except BufferError:
+            # 仍有未结束的迭代器引用数据，交给垃圾回收释放
+            pass
+        self._records = None
+        self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def load_binary(filename: str) -> List[Dict[str, Any]]:
+    """读取二进制宏文件为步骤列表"""
+    with BinaryMacro(filename) as macro:
+        return list(macro)
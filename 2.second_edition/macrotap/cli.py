@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+import os
+import sys
+from typing import List, Optional
+
+from .binfmt import COMPRESSIONS, is_binary_macro
+from .stream import MacroStream
+from .backends import BACKENDS, RecordingBackend, create_backend
+from .bench import DEFAULT_SIZES, DEFAULT_DELAYS, run_benchmarks, save_results
+from .engine import MacroEngine, RATE_UNITS
+from .jitter import JITTER_DISTRIBUTIONS
+from .steps import StepManager
+from .timeline import TimelineEngine, is_timeline_file, load_timeline
+
+logger = logging.getLogger("AutoClicker")
+
+def build_parser() -> argparse.ArgumentParser:
+    """命令行参数定义"""
+    parser = argparse.ArgumentParser(prog="macrotap", description="无界面的多步骤连点器")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="播放步骤文件")
+    run_parser.add_argument("steps", help="步骤文件 (steps.json)，或 {\"tracks\": [...]} 形式的多轨道时间线")
+    run_parser.add_argument("--config", help="配置文件 (config.json)，命令行参数优先")
+    run_parser.add_argument("--loops", type=int, help="循环次数 (0=无限)")
+    run_parser.add_argument("--step-delay", type=float, help="步骤间隔(秒)")
+    run_parser.add_argument("--loop-delay", type=float, help="循环间隔(秒)")
+    run_parser.add_argument("--rate", type=float, help="目标速率，设置后忽略对应的间隔参数 (0=关闭)")
+    run_parser.add_argument("--rate-unit", choices=RATE_UNITS,
+                            help="目标速率单位: aps=每秒动作数，lpm=每分钟循环数")
+    run_parser.add_argument("--jitter", type=float, help="步骤间隔随机抖动幅度(秒)")
+    run_parser.add_argument("--loop-jitter", type=float, help="循环间隔随机抖动幅度(秒)")
+    run_parser.add_argument("--jitter-dist", choices=sorted(JITTER_DISTRIBUTIONS), help="抖动分布")
+    run_parser.add_argument("--seed", type=int, help="抖动种子，相同种子得到相同的节奏")
+    run_parser.add_argument("--stream", action="store_true",
+                            help="边读边播放 .mtap 文件，不把整个宏载入内存")
+    run_parser.add_argument("--backend", choices=sorted(BACKENDS), default="pynput",
+                            help="输入后端，record 只在内存中记录事件，不需要显示器")
+
+    convert_parser = subparsers.add_parser("convert", help="在 JSON 和二进制 .mtap 格式之间转换")
+    convert_parser.add_argument("source", help="输入文件，格式自动识别")
+    convert_parser.add_argument("target", help="输出文件，扩展名为 .mtap 时写二进制格式，否则写 JSON")
+    convert_parser.add_argument("--compress", choices=sorted(COMPRESSIONS), default="none",
+                                help="二进制格式的压缩方式")
+
+    bench_parser = subparsers.add_parser("bench", help="用空后端测量播放吞吐和定时抖动")
+    bench_parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="合成宏的步骤数")
+    bench_parser.add_argument("--delays", type=float, nargs="+", default=list(DEFAULT_DELAYS), help="步骤间隔(秒)")
+    bench_parser.add_argument("--budget", type=float, default=2.0, help="有间隔时每组测试的时长上限(秒)")
+    bench_parser.add_argument("--output", help="结果保存为 JSON 文件")
+    return parser
+
+def load_run_config(args) -> dict:
+    """合并配置文件和命令行参数"""
+    config = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config.update(json.load(f))
+    if args.loops is not None:
+        config['loop_count'] = args.loops
+    if args.step_delay is not None:
+        config['step_delay'] = args.step_delay
+    if args.loop_delay is not None:
+        config['loop_delay'] = args.loop_delay
+    if args.rate is not None:
+        config['target_rate'] = args.rate
+    if args.rate_unit is not None:
+        config['target_unit'] = args.rate_unit
+    if args.jitter is not None:
+        config['step_jitter'] = args.jitter
+    if args.loop_jitter is not None:
+        config['loop_jitter'] = args.loop_jitter
+    if args.jitter_dist is not None:
+        config['jitter_dist'] = args.jitter_dist
+    if args.seed is not None:
+        config['jitter_seed'] = args.seed
+    return config
+
+def run_command(args) -> int:
+    """执行 run 子命令"""
+    if not os.path.exists(args.steps):
+        logger.error(f"步骤文件不存在: {args.steps}")
+        return 1
+    if args.stream:
+        if not is_binary_macro(args.steps):
+            logger.error("--stream 只支持二进制 .mtap 文件，可先用 convert 转换")
+            return 1
+        steps = MacroStream(args.steps)
+    elif is_timeline_file(args.steps):
+        try:
+            steps = load_timeline(args.steps)
+        except ValueError as e:
+            logger.error(f"加载时间线失败: {e}")
+            return 1
+    else:
+        step_manager = StepManager()
+        if not step_manager.load_from_file(args.steps):
+            return 1
+        steps = step_manager.steps
+    if not len(steps):
+        logger.error("步骤文件为空")
+        return 1
+
+    def on_loop(engine: MacroEngine) -> None:
+        total = engine.max_loops or "无限"
+        logger.info(f"循环: {engine.current_loop}/{total} {engine.scheduler.summary()}")
+
+    backend = create_backend(args.backend)
+    engine_class = TimelineEngine if is_timeline_file(args.steps) else MacroEngine
+    engine = engine_class(steps, load_run_config(args), on_loop=on_loop, backend=backend)
+    try:
+        loops = engine.run()
+    except ValueError as e:
+        logger.error(f"编译步骤失败: {e}")
+        return 1
+    except KeyboardInterrupt:
+        engine.stop()
+        loops = engine.current_loop
+    logger.info(f"已完成 {loops} 次循环 {engine.scheduler.summary()}")
+    if isinstance(backend, RecordingBackend):
+        logger.info(f"记录事件 {backend.count} 个，覆盖 {backend.dropped} 个")
+    backend.close()
+    return 0
+
+def convert_command(args) -> int:
+    """执行 convert 子命令"""
+    step_manager = StepManager()
+    if not step_manager.load_from_file(args.source):
+        return 1
+    if not step_manager.save_to_file(args.target, args.compress):
+        return 1
+    logger.info(f"已转换 {len(step_manager.steps)} 个步骤: {args.source} -> {args.target}")
+    return 0
+
+def bench_command(args) -> int:
+    """执行 bench 子命令"""
+    report = run_benchmarks(args.sizes, args.delays, args.budget)
+    if args.output:
+        save_results(report, args.output)
+        logger.info(f"结果已保存到 {args.output}")
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    args = build_parser().parse_args(argv)
+    if args.command == "run":
+        return run_command(args)
+    if args.command == "convert":
+        return convert_command(args)
+    if args.command == "bench":
+        return bench_command(args)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+import math
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from .backends import InputBackend
+from .scheduler import seconds_to_ns
+
+# 编译后的单个动作: (后端方法, 参数, 到下一个动作的间隔纳秒)，方法为 None 表示纯延时
+# 方法为 None 且参数不为 None 时是跳转指令，参数为 (目标位置, 次数上限)，见 follow_jumps
+CompiledStep = Tuple[Optional[Callable[[Any], None]], Any, int]
+
+# 流程控制步骤类型，编译后不占用调度
+CONTROL_TYPES = ("repeat", "end", "label", "goto")
+
+def is_jump(instruction: CompiledStep) -> bool:
+    """是否为跳转指令"""
+    return instruction[0] is None and instruction[1] is not None
+
+def follow_jumps(program, pc: int, counters: Dict[int, int]) -> int:
+    """从 pc 开始执行连续的跳转指令，返回下一个动作或延时的位置(可能等于程序长度)
+
+    次数上限为 None 时无条件跳转；否则最多跳转上限次，之后顺序执行并把计数清零，
+    以便外层再次进入时重新计数。counters 以指令位置为键，每轮循环开始时应为空。
+    """
+    n = len(program)
+    hops = 0
+    while pc < n:
+        func, arg, _ = program[pc]
+        if func is not None or arg is None:
+            return pc
+        # 编译时已排除没有动作的跳转环，连续跳转不会超过程序长度；超过说明程序有误，
+        # 直接报错，避免线程空转且无法停止
+        hops += 1
+        if hops > n:
+            raise ValueError(f"第{pc+1}条指令处的跳转形成没有动作的死循环")
+        target, limit = arg
+        if limit is None:
+            pc = target
+            continue
+        taken = counters.get(pc, 0)
+        if taken < limit:
+            counters[pc] = taken + 1
+            pc = target
+        else:
+            counters[pc] = 0
+            pc += 1
+    return pc
+
+# 连发时相邻两批的最小间隔；间隔更短的点击合并为一批，由后端一次性发送
+BURST_MIN_INTERVAL_NS = 1_000_000
+
+def burst_actions(backend: InputBackend, button: Any, count: int, cps: float,
+                  step_delay_ns: int) -> List[CompiledStep]:
+    """把"以 cps 的速度点击 count 次"编译为若干批 click_many 动作
+
+    点击间隔不小于 BURST_MIN_INTERVAL_NS 时每批一次点击，完全按间隔调度；
+    更快时把 BURST_MIN_INTERVAL_NS 内的点击合并成一批，批与批之间仍按截止时间对齐，
+    平均速度保持为 cps。最后一批之后是正常的步骤间隔。
+    """
+    count = int(count)
+    cps = float(cps)
+    if count <= 0:
+        raise ValueError("连发次数必须大于0")
+    if not cps > 0:
+        raise ValueError("连发速度必须大于0")
+    interval_ns = 1_000_000_000 / cps
+    size = min(count, max(1, math.ceil(BURST_MIN_INTERVAL_NS / interval_ns)))
+    batches, rest = divmod(count, size)
+    batch_ns = int(round(interval_ns * size))
+    actions: List[CompiledStep] = [(backend.click_many, (button, size), batch_ns)] * batches
+    if rest:
+        actions.append((backend.click_many, (button, rest), batch_ns))
+    func, arg, _ = actions[-1]
+    actions[-1] = (func, arg, step_delay_ns)
+    return actions
+
+def compile_steps(steps: List[Dict[str, Any]], backend: InputBackend,
+                  step_delay: float) -> Tuple[CompiledStep, ...]:
+    """将步骤列表编译为预先绑定好后端方法和参数的不可变动作序列，见 compile_program"""
+    return compile_program(steps, backend, step_delay)[0]
+
+def compile_program(steps: List[Dict[str, Any]], backend: InputBackend,
+                    step_delay: float) -> Tuple[Tuple[CompiledStep, ...], Tuple[int, ...]]:
+    """将步骤列表编译为 (动作序列, 来源步骤序号)
+
+    动作序列预先绑定好后端方法和参数；来源步骤序号与动作序列等长，记录每条指令
+    由第几步(从0开始)编译而来，连发拆成的多批和 end 编译出的跳转都对应原来的那一步，
+    播放时据此显示和统计步骤。
+
+    每次运行只编译一次，循环中不再做字符串比较和按键查找。
+    流程控制步骤编译为跳转指令，重复块不会展开:
+        {"type": "repeat", "count": N} ... {"type": "end"}   块内步骤执行 N 次，可嵌套
+        {"type": "label", "name": "a"}                       跳转目标
+        {"type": "goto", "label": "a", "count": K}           跳到标签，省略 count 时无条件跳转，
+                                                             否则跳转 K 次后继续向下执行
+    """
+    mouse_actions = {
+        "click": backend.click,
+        "press": backend.press_button,
+        "release": backend.release_button,
+    }
+    keyboard_actions = {
+        "press": backend.press_key,
+        "release": backend.release_key,
+    }
+
+    step_delay_ns = seconds_to_ns(step_delay)
+    program = []
+    sources: List[int] = []
+    labels: Dict[str, int] = {}
+    gotos: List[Tuple[int, int, str]] = []   # (指令位置, 步骤序号, 标签)
+    blocks: List[Tuple[int, int, int]] = []  # (块开始位置, 步骤序号, 次数)
+    for i, step in enumerate(steps):
+        step_type = step.get("type")
+        action = step.get("action")
+        try:
+            if step_type == "repeat":
+                count = int(step["count"])
+                if count < 1:
+                    raise ValueError("重复次数必须大于0")
+                blocks.append((len(program), i, count))
+            elif step_type == "end":
+                if not blocks:
+                    raise ValueError("没有对应的 repeat")
+                start, _, count = blocks.pop()
+                # 空的重复块不产生跳转，否则会成为跳回自身的空循环
+                if count > 1 and start < len(program):
+                    program.append((None, (start, count - 1), 0))
+            elif step_type == "label":
+                name = str(step["name"])
+                if name in labels:
+                    raise ValueError(f"标签重复: {name}")
+                labels[name] = len(program)
+            elif step_type == "goto":
+                count = step.get("count")
+                limit = None if count is None else int(count)
+                if limit is not None and limit < 0:
+                    raise ValueError("跳转次数不能为负数")
+                gotos.append((len(program), i, str(step["label"])))
+                program.append((None, (0, limit), 0))
+            elif step_type == "mouse" and action == "burst":
+                program.extend(burst_actions(backend, backend.resolve_button(step.get("button")),
+                                             step["count"], step["cps"], step_delay_ns))
+            elif step_type == "mouse" and action == "move":
+                program.append((backend.move, (int(step["x"]), int(step["y"])), step_delay_ns))
+            elif step_type == "mouse" and action in mouse_actions:
+                program.append((mouse_actions[action], backend.resolve_button(step.get("button")), step_delay_ns))
+            elif step_type == "keyboard" and action == "type":
+                program.append((backend.type, str(step["text"]), step_delay_ns))
+            elif step_type == "keyboard" and action in keyboard_actions:
+                program.append((keyboard_actions[action], backend.resolve_key(step.get("key")), step_delay_ns))
+            elif step_type == "delay":
+                duration = float(step["duration"])
+                if duration < 0:
+                    raise ValueError("延时不能为负数")
+                # 延时步骤不叠加步骤间隔
+                program.append((None, None, seconds_to_ns(duration)))
+            else:
+                raise ValueError(f"类型或动作未知: {step_type}/{action}")
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"第{i+1}步参数无效 {step}: {e}") from e
+        sources.extend([i] * (len(program) - len(sources)))
+
+    if blocks:
+        raise ValueError(f"第{blocks[-1][1]+1}步的 repeat 没有对应的 end")
+    for pc, i, label in gotos:
+        if label not in labels:
+            raise ValueError(f"第{i+1}步跳转到不存在的标签: {label}")
+        program[pc] = (None, (labels[label], program[pc][1][1]), 0)
+    cycle = find_jump_cycle(program)
+    if cycle is not None:
+        step = next((i for pc, i, _ in gotos if pc == cycle), None)
+        where = f"第{step+1}步的跳转" if step is not None else "重复块"
+        raise ValueError(f"{where}会形成没有动作的死循环")
+    return tuple(program), tuple(sources)
+
+def find_jump_cycle(program) -> Optional[int]:
+    """查找只由跳转指令组成的环，返回环上一条指令的位置，没有时返回 None
+
+    跳转指令的后继是目标位置，有次数上限时还包括下一条指令；只保留后继仍是跳转的边。
+    这样的环中没有任何动作或延时，执行时会一直空转，因此编译时直接拒绝。
+    """
+    n = len(program)
+    jumps = {pc for pc in range(n) if is_jump(program[pc])}
+    state: Dict[int, int] = {}  # 1: 正在搜索, 2: 已确认不在环上
+    for root in jumps:
+        if root in state:
+            continue
+        state[root] = 1
+        stack = [(root, iter(jump_successors(program, root)))]
+        while stack:
+            pc, successors = stack[-1]
+            for succ in successors:
+                if succ not in jumps:
+                    continue
+                if state.get(succ) == 1:
+                    return succ
+                if succ not in state:
+                    state[succ] = 1
+                    stack.append((succ, iter(jump_successors(program, succ))))
+                    break
+            else:
+                state[pc] = 2
+                stack.pop()
+    return None
+
+def jump_successors(program, pc: int) -> Tuple[int, ...]:
+    """跳转指令执行后可能到达的位置"""
+    target, limit = program[pc][1]
+    return (target,) if limit is None else (target, pc + 1)
+
+def measure_loop(program, sources) -> Optional[Tuple[int, int]]:
+    """按程序结构算出一轮的 (动作间隔以外的时长纳秒, 步骤间隔个数)，不展开执行
+
+    前者为延时步骤和连发内部各批间隔之和(按 step_delay=0 编译时即全部间隔之和)，
+    后者为一轮中执行到的动作步骤数，即出现步骤间隔的次数。重复块和带次数的向回跳转
+    按次数相乘，耗时只与指令数有关。含无条件跳转、向前跳转或互相交叉的跳转时
+    无法按结构计算，返回 None。
+    """
+    n = len(program)
+    # 执行到各位置之前累计的时长和间隔个数，循环体按次数计入
+    fixed = [0] * (n + 1)
+    gaps = [0] * (n + 1)
+    closed: List[Tuple[int, int]] = []  # 已结束的循环 (目标位置, 跳转位置)
+    for pc, (func, arg, delay_ns) in enumerate(program):
+        fixed_ns, count = fixed[pc], gaps[pc]
+        if func is None and arg is not None:
+            target, limit = arg
+            if limit is None or target > pc:
+                return None
+            # 之前结束的循环要么完全在本循环内，要么完全在它之前
+            while closed and closed[-1][1] >= target:
+                if closed.pop()[0] < target:
+                    return None
+            closed.append((target, pc))
+            # 循环体已执行过一次，再执行 limit 次
+            fixed_ns += limit * (fixed_ns - fixed[target])
+            count += limit * (count - gaps[target])
+        else:
+            fixed_ns += delay_ns
+            if func is not None and (pc + 1 == n or sources[pc + 1] != sources[pc]):
+                count += 1
+        fixed[pc + 1], gaps[pc + 1] = fixed_ns, count
+    return fixed[n], gaps[n]
+
+class ProgramCache:
+    """按内容哈希缓存编译结果的 LRU
+
+    编译结果绑定了后端方法，因此键同时包含后端对象和步骤间隔；
+    同一个后端重复运行最近用过的宏时直接复用，不再编译。缓存的是 compile_program 的结果。
+    """
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self.programs: "OrderedDict[Tuple[str, int, int], Tuple[Tuple[CompiledStep, ...], Tuple[int, ...]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, steps: List[Dict[str, Any]], backend: InputBackend,
+            step_delay: float) -> Tuple[Tuple[CompiledStep, ...], Tuple[int, ...]]:
+        """返回缓存的 (动作序列, 来源步骤序号)，没有时编译并放入缓存"""
+        cache_key = (key, id(backend), seconds_to_ns(step_delay))
+        program = self.programs.get(cache_key)
+        if program is not None:
+            self.hits += 1
+            self.programs.move_to_end(cache_key)
+            return program
+        self.misses += 1
+        program = compile_program(steps, backend, step_delay)
+        self.programs[cache_key] = program
+        if len(self.programs) > self.capacity:
+            self.programs.popitem(last=False)
+        return program
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self.programs.clear()
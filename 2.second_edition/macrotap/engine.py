@@ -0,0 +1,406 @@
+import logging
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable, Union
+
+from .backends import InputBackend, PynputBackend
+from .compiler import ProgramCache, compile_program, follow_jumps, is_jump, measure_loop
+from .jitter import create_jitter
+from .metrics import StepTimings
+from .status import EngineStatus, StatusSlot
+from .stream import MacroStream, RecordCompiler
+from .scheduler import DeadlineScheduler, seconds_to_ns
+
+logger = logging.getLogger("AutoClicker")
+
+# 默认配置，界面和命令行共用
+DEFAULT_CONFIG = {
+    'step_delay': 0.5,
+    'loop_delay': 0.5,
+    'loop_count': 0,  # 0表示无限循环
+    'start_hotkey': 'f',
+    'stop_hotkey': 'q',
+    'pause_hotkey': 'p',
+    'countdown': 5,  # 开始前的倒计时(秒)，0表示立即开始
+    'resume_countdown': 0,  # 暂停后继续前的倒计时(秒)，0表示立即继续
+    'record_hotkey': 'f9',
+    'target_rate': 0,  # 目标速率，0表示按步骤/循环间隔播放
+    'target_unit': 'aps',
+    'step_jitter': 0,  # 步骤间隔随机抖动幅度(秒)，0表示不抖动
+    'loop_jitter': 0,  # 循环间隔随机抖动幅度(秒)
+    'jitter_dist': 'uniform',  # 抖动分布，见 jitter.JITTER_DISTRIBUTIONS
+    'jitter_seed': None,  # 抖动种子，相同种子得到相同的节奏；None表示每次随机
+    'profiles': [],  # 绑定快捷键的宏列表，见 hotkeys.MacroProfile
+    'library_dir': 'macros',
+    'bg_image': None
+}
+
+# 目标速率单位: 每秒动作数、每分钟循环数
+RATE_UNITS = ('aps', 'lpm')
+
+# 按动作速率播放时令牌桶的容量(个动作)，落后超过这么多个动作时放弃补发
+RATE_BURST = 4
+
+# 运行中发布状态快照的最小间隔，快照在循环开始时和按此间隔合并发布
+STATUS_INTERVAL_NS = 50_000_000
+
+class MacroEngine:
+    """无界面的宏播放引擎
+
+    一个实例对应一次运行: 创建后即处于可运行状态，stop() 可以在 run() 之前或运行中
+    的任意线程调用。引擎不依赖 tkinter，状态通过回调通知调用方。
+    未指定 backend 时在 run() 中创建默认的 PynputBackend；传入 timings 时记录每个动作的
+    注入耗时和定时偏差；传入 program_cache 和 steps_key(步骤内容的哈希)时复用缓存的编译结果。
+
+    config['target_rate'] 大于 0 时进入目标速率模式: 单位 'aps' 时每个动作消耗一个令牌，
+    取代步骤间隔和循环间隔；'lpm' 时每轮循环消耗一个令牌，取代循环间隔，每轮的周期
+    扣除延时步骤后平均分配给各步骤间隔(流式播放或含无条件、向前跳转时动作连续执行，
+    余下的时间在轮末等待)，延时步骤本身已超过周期时记录警告并在状态中标出。令牌桶以
+    GCRA 的形式实现在截止时间上 —— 下一个截止时间就是下一个令牌的到达时间，
+    注入耗时自然从等待中扣除；桶容量即调度器允许补发的落后量。延时步骤照常等待。
+    运行状态以快照形式发布到 status 槽位(每轮开始时及最多每
+    STATUS_INTERVAL_NS 一次)，界面按自己的频率轮询，不需要引擎向界面线程投递事件。
+    pause() 在任意线程调用后引擎停在当前位置(步骤、轮数和尚未等完的间隔都保留)，
+    resume() 后从原处继续，之后的截止时间整体顺延暂停的时长。
+    config['step_jitter']/['loop_jitter'] 大于 0 时给每一步之后的间隔(含延时步骤，
+    连发内部各批之间除外)和循环间隔加上预先生成的随机偏移，见 jitter.JitterSchedule。
+    """
+    def __init__(self, steps: Union[List[Dict[str, Any]], MacroStream], config: Dict[str, Any],
+                 on_loop: Optional[Callable[["MacroEngine"], None]] = None,
+                 backend: Optional[InputBackend] = None,
+                 scheduler: Optional[DeadlineScheduler] = None,
+                 timings: Optional[StepTimings] = None,
+                 program_cache: Optional[ProgramCache] = None, steps_key: Optional[str] = None):
+        self.steps = steps
+        self.program_cache = program_cache
+        self.steps_key = steps_key
+        self.timings = timings
+        self.backend = backend
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config)
+        self.on_loop = on_loop
+        self.max_loops = self.config['loop_count']
+        self.current_loop = 0
+        self.current_step = 0
+        self.actions_done = 0
+        self.step_delay = self.config['step_delay']
+        self.rate_unit = None
+        self.loop_period_ns = 0
+        self.loop_started_ns = 0
+        self.rate_overrun = False
+        self.step_jitter = None
+        self.loop_jitter = None
+        self.prepared = False
+        self.program = None
+        # 每条指令对应的步骤序号，current_step 和耗时统计都按步骤序号记录
+        self.sources = None
+        self.start_at_ns = None
+        self.is_running = True
+        self.pausing = False
+        self.is_paused = False
+        self.paused_ns = 0
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.started_ns = 0
+        self.next_status_ns = 0
+        self.status = StatusSlot()
+        self.scheduler = scheduler if scheduler is not None else DeadlineScheduler()
+
+    def stop(self) -> None:
+        """请求停止，正在等待(包括暂停)时立即生效，否则当前动作结束后生效"""
+        self.is_running = False
+        self.resume_event.set()
+        self.scheduler.wake.set()
+
+    def pause(self) -> None:
+        """请求暂停，正在等待时立即生效，否则在下一个动作之前生效"""
+        self.resume_event.clear()
+        self.pausing = True
+        self.scheduler.wake.set()
+
+    def resume(self) -> None:
+        """从暂停处继续"""
+        self.pausing = False
+        self.resume_event.set()
+
+    def _wait_paused(self, late: Optional[int]) -> int:
+        """scheduler.wait() 被暂停/停止打断或返回时已请求暂停: 停止时直接返回，暂停时等到恢复后
+        再等完剩余的时间
+
+        先清除唤醒事件再检查停止和暂停标志，stop()/pause() 在两者之间调用时下一次 wait
+        会立即返回，不会漏掉。
+        """
+        scheduler = self.scheduler
+        while late is None or self.pausing:
+            scheduler.wake.clear()
+            if not self.is_running:
+                return 0
+            if self.pausing:
+                self._hold()
+                if not self.is_running:
+                    return 0
+            late = scheduler.wait()
+        return late
+
+    def _hold(self) -> None:
+        """阻塞到 resume() 或 stop()，之后的截止时间顺延暂停的时长"""
+        paused_at = time.monotonic_ns()
+        self.is_paused = True
+        self.publish_status()
+        self.resume_event.wait()
+        shift = time.monotonic_ns() - paused_at
+        self.paused_ns += shift
+        self.scheduler.deadline += shift
+        self.loop_started_ns += shift
+        self.started_ns += shift
+        self.is_paused = False
+        self.publish_status()
+
+    def prepare(self) -> None:
+        """创建后端并编译步骤，run() 之前(如倒计时期间)调用可让第一个动作准时发出
+
+        步骤无效时抛出 ValueError；run() 不会重复已完成的准备。
+        """
+        if self.prepared:
+            return
+        self._apply_target_rate()
+        self._create_jitter()
+        if self.backend is None:
+            self.backend = PynputBackend()
+        if not isinstance(self.steps, MacroStream):
+            self.program, self.sources = self._compile()
+            if self.rate_unit == 'lpm':
+                self._spread_loop_period()
+        self.prepared = True
+
+    def _create_jitter(self) -> None:
+        """按配置创建随机抖动，后续批次的偏移在调度器空闲时生成"""
+        self.step_jitter, self.loop_jitter = create_jitter(self.config)
+        self.scheduler.idle = [jitter.fill_ahead for jitter in (self.step_jitter, self.loop_jitter)
+                               if jitter is not None]
+
+    def run(self, start_ns: Optional[int] = None) -> int:
+        """在调用线程中播放宏，返回完成的循环次数
+
+        steps 为 MacroStream 时边读边播放，否则先整体编译。步骤无效时抛出 ValueError。
+        start_ns 为第一个动作的 time.monotonic_ns() 时刻，省略时立即开始。
+        """
+        self.start_at_ns = start_ns
+        try:
+            self.prepare()
+            if isinstance(self.steps, MacroStream):
+                self._play_stream(self.steps)
+            else:
+                self._play(self.program, self.sources)
+        finally:
+            self.is_running = False
+            self.publish_status()
+        return self.current_loop
+
+    def _compile(self):
+        """编译步骤为 (动作序列, 来源步骤序号)，给出了内容键和缓存时优先复用缓存"""
+        if self.program_cache is not None and self.steps_key is not None:
+            return self.program_cache.get(self.steps_key, self.steps, self.backend, self.step_delay)
+        return compile_program(self.steps, self.backend, self.step_delay)
+
+    def _apply_target_rate(self) -> None:
+        """根据目标速率确定实际的步骤间隔、循环周期和令牌桶容量"""
+        rate = float(self.config['target_rate'] or 0)
+        unit = self.config['target_unit']
+        if rate < 0:
+            raise ValueError(f"目标速率不能为负数: {rate}")
+        if unit not in RATE_UNITS:
+            raise ValueError(f"未知速率单位: {unit}")
+        if rate == 0:
+            return
+        self.rate_unit = unit
+        if unit == 'aps':
+            self.step_delay = 1 / rate
+            self.scheduler.max_catchup_ns = seconds_to_ns(RATE_BURST / rate)
+        else:
+            self.loop_period_ns = seconds_to_ns(60 / rate)
+            # 先按无间隔编译，量出一轮的固定时长后由 _spread_loop_period 确定间隔
+            self.step_delay = 0.0
+
+    def _spread_loop_period(self) -> None:
+        """每分钟轮数模式: 把周期扣除延时步骤后的时间平均分配给各步骤间隔并重新编译"""
+        measured = measure_loop(self.program, self.sources)
+        if measured is None:
+            # 仍按周期开始每一轮，只是动作连续执行，余下的时间在轮末等待
+            logger.warning("宏中含无条件跳转或向前跳转，无法预先算出一轮的时长，步骤间隔不做分配")
+            return
+        fixed_ns, gaps = measured
+        spare_ns = self.loop_period_ns - fixed_ns
+        if spare_ns < 0:
+            logger.warning(f"一轮中的延时合计 {fixed_ns / 1_000_000_000:.3f} 秒，"
+                           f"超过目标周期 {self.loop_period_ns / 1_000_000_000:.3f} 秒，实际轮速会低于目标")
+            self.rate_overrun = True
+            return
+        if gaps:
+            self.step_delay = spare_ns / gaps / 1_000_000_000
+            self.program, self.sources = self._compile()
+
+    def _next_loop_delay(self, loop_delay_ns: int) -> int:
+        """本轮结束到下一轮开始的间隔，目标速率模式下由令牌决定"""
+        if self.rate_unit == 'aps':
+            delay_ns = 0
+        elif self.rate_unit is None:
+            delay_ns = loop_delay_ns
+        else:
+            delay_ns = max(0, self.loop_started_ns + self.loop_period_ns - self.scheduler.deadline)
+        if self.loop_jitter is not None:
+            delay_ns = self.loop_jitter.apply(delay_ns)
+        return delay_ns
+
+    def _start(self) -> None:
+        """运行开始前的准备"""
+        if self.timings is not None:
+            self.timings.reset()
+        self.scheduler.start(self.start_at_ns)
+        self.started_ns = self.scheduler.deadline
+
+    def _has_next_loop(self) -> bool:
+        """是否还需要开始下一轮循环"""
+        return self.is_running and (self.max_loops == 0 or self.current_loop < self.max_loops)
+
+    def _begin_loop(self) -> None:
+        """开始新一轮循环"""
+        self.current_loop += 1
+        self.loop_started_ns = self.scheduler.deadline
+        self.publish_status()
+        if self.on_loop is not None:
+            self.on_loop(self)
+
+    def publish_status(self) -> None:
+        """把当前状态发布到 status 槽位"""
+        scheduler = self.scheduler
+        now = time.monotonic_ns()
+        self.next_status_ns = now + STATUS_INTERVAL_NS
+        elapsed = (now - self.started_ns) / 1_000_000_000 if self.started_ns else 0.0
+        actions = self.actions_done
+        self.status.publish(EngineStatus(
+            loop=self.current_loop,
+            max_loops=self.max_loops,
+            step=self.current_step,
+            actions=actions,
+            actions_per_sec=actions / elapsed if elapsed > 0 else 0.0,
+            loops_per_min=max(0, self.current_loop - 1) * 60 / elapsed if elapsed > 0 else 0.0,
+            late_mean_ms=scheduler.total_late_ns / scheduler.count / 1_000_000 if scheduler.count else 0.0,
+            late_max_ms=scheduler.max_late_ns / 1_000_000,
+            target_rate=float(self.config['target_rate'] or 0),
+            target_unit=self.config['target_unit'],
+            paused=self.is_paused,
+            rate_overrun=self.rate_overrun,
+        ))
+
+    def _execute(self, actions, sources) -> bool:
+        """按截止时间执行一段动作，被停止时返回 False；sources 为各动作对应的步骤序号
+
+        随机抖动只加在一步结束后的间隔上，连发各批之间的间隔保持不变。
+        """
+        scheduler = self.scheduler
+        timings = self.timings
+        jitter = self.step_jitter
+        last = len(actions) - 1
+        for pc, (func, arg, delay_ns) in enumerate(actions):
+            index = sources[pc]
+            late = scheduler.wait()
+            if late is None or self.pausing:
+                late = self._wait_paused(late)
+            if not self.is_running:
+                return False
+            self.current_step = index
+            if scheduler.deadline >= self.next_status_ns:
+                self.publish_status()
+            if func is not None:
+                self.actions_done += 1
+                if timings is None:
+                    func(arg)
+                else:
+                    started = time.monotonic_ns()
+                    func(arg)
+                    timings.record(index, late, time.monotonic_ns() - started)
+            if jitter is not None and (pc == last or sources[pc + 1] != index):
+                delay_ns = jitter.apply(delay_ns)
+            scheduler.advance(delay_ns)
+        return True
+
+    def _execute_jumps(self, program, sources) -> bool:
+        """用程序计数器执行含跳转指令的动作序列，被停止时返回 False
+
+        跳转本身不经过调度器；不含跳转的程序走 _execute，省去每步的指令判断。
+        随机抖动的规则与 _execute 相同。
+        """
+        scheduler = self.scheduler
+        timings = self.timings
+        jitter = self.step_jitter
+        counters = {}
+        pc = 0
+        end = len(program)
+        while pc < end:
+            func, arg, delay_ns = program[pc]
+            if func is None and arg is not None:
+                pc = follow_jumps(program, pc, counters)
+                if not self.is_running:
+                    return False
+                continue
+            late = scheduler.wait()
+            if late is None or self.pausing:
+                late = self._wait_paused(late)
+            if not self.is_running:
+                return False
+            self.current_step = sources[pc]
+            if scheduler.deadline >= self.next_status_ns:
+                self.publish_status()
+            if func is not None:
+                self.actions_done += 1
+                if timings is None:
+                    func(arg)
+                else:
+                    started = time.monotonic_ns()
+                    func(arg)
+                    timings.record(sources[pc], late, time.monotonic_ns() - started)
+            if jitter is not None and (pc + 1 == end or sources[pc + 1] != sources[pc]):
+                delay_ns = jitter.apply(delay_ns)
+            scheduler.advance(delay_ns)
+            pc += 1
+        return True
+
+    def _play(self, program, sources) -> None:
+        """循环执行整体编译好的动作序列"""
+        loop_delay_ns = seconds_to_ns(self.config['loop_delay'])
+        has_jumps = any(is_jump(instruction) for instruction in program)
+        self._start()
+        while program and self._has_next_loop():
+            self._begin_loop()
+            if has_jumps:
+                self._execute_jumps(program, sources)
+            else:
+                self._execute(program, sources)
+            if self._has_next_loop():
+                self.scheduler.advance(self._next_loop_delay(loop_delay_ns))
+
+    def _play_stream(self, stream: MacroStream) -> None:
+        """边读取边编译边执行，内存占用只与块大小有关"""
+        if not len(stream) or not self._has_next_loop():
+            return
+        loop_delay_ns = seconds_to_ns(self.config['loop_delay'])
+        compiler = RecordCompiler(self.backend, stream.strings, seconds_to_ns(self.step_delay))
+        chunks = stream.chunks(self.max_loops)
+        self._start()
+        self._begin_loop()
+        try:
+            for chunk in chunks:
+                if chunk is None:
+                    # 一轮结束
+                    if not self._has_next_loop():
+                        break
+                    self.scheduler.advance(self._next_loop_delay(loop_delay_ns))
+                    compiler.reset()
+                    self._begin_loop()
+                    continue
+                actions, sources = compiler.compile_chunk(chunk)
+                if not self._execute(actions, sources):
+                    break
+        finally:
+            chunks.close()
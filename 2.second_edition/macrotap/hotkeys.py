@@ -0,0 +1,121 @@
+import logging
+import os
+from typing import List, Dict, Any, Optional, Tuple
+
+from .library import file_hash
+from .steps import StepManager
+
+logger = logging.getLogger("AutoClicker")
+
+# 修饰键对应的位，组合键按 (修饰键位掩码, 主键名称) 查表
+MODIFIER_BITS = {"ctrl": 1, "shift": 2, "alt": 4, "cmd": 8}
+
+def parse_chord(text: str) -> Tuple[int, str]:
+    """"ctrl+alt+1" -> (修饰键位掩码, "1")，单个按键的掩码为 0"""
+    parts = [part.strip().lower() for part in str(text).split("+")]
+    if not parts or not all(parts):
+        raise ValueError(f"快捷键格式无效: {text!r}")
+    *modifiers, key = parts
+    mask = 0
+    for name in modifiers:
+        if name not in MODIFIER_BITS:
+            raise ValueError(f"未知修饰键: {name}")
+        mask |= MODIFIER_BITS[name]
+    return mask, key
+
+def normalize_key(name: str) -> str:
+    """按住 ctrl 时部分平台给出控制字符(如 \\x01)，还原为对应字母"""
+    if len(name) == 1 and ord(name) < 32:
+        return chr(ord(name) + 96)
+    return name.lower() if len(name) == 1 else name
+
+class HotkeyTable:
+    """预先计算好的快捷键分派表
+
+    绑定时把快捷键解析为 (修饰键位掩码, 主键名称)；监听线程每次按键只更新当前修饰键
+    掩码并做一次字典查找，与绑定数量无关。修改绑定不需要重启监听器。
+    """
+    def __init__(self):
+        self.bindings: Dict[Tuple[int, str], Any] = {}
+        self.modifiers = 0
+
+    def clear(self) -> None:
+        """清空所有绑定"""
+        self.bindings = {}
+
+    def bind(self, chord: str, action: Any) -> None:
+        """绑定快捷键，与已有绑定冲突时抛出 ValueError"""
+        key = parse_chord(chord)
+        if key in self.bindings:
+            raise ValueError(f"快捷键冲突: {chord}")
+        self.bindings[key] = action
+
+    def press(self, name: Optional[str]) -> Optional[Any]:
+        """按键按下，返回绑定的动作，没有绑定时返回 None"""
+        if name is None:
+            return None
+        name = normalize_key(name)
+        bit = MODIFIER_BITS.get(name, 0)
+        action = self.bindings.get((self.modifiers & ~bit, name))
+        self.modifiers |= bit
+        return action
+
+    def release(self, name: Optional[str]) -> None:
+        """按键释放，更新修饰键状态"""
+        if name is not None:
+            self.modifiers &= ~MODIFIER_BITS.get(normalize_key(name), 0)
+
+class MacroProfile:
+    """绑定到快捷键的命名宏
+
+    步骤可以直接写在配置中，也可以是步骤文件路径(相对路径相对配置所在目录)；
+    步骤在加载配置时读入，按快捷键切换时不再访问磁盘。
+    其余字段(step_delay、loop_count、target_rate 等)覆盖全局配置。
+    key 为步骤文件内容的哈希，用于复用编译缓存；步骤直接写在配置中时为 None。
+    """
+    RESERVED = ("name", "hotkey", "steps")
+
+    def __init__(self, name: str, hotkey: str, steps: List[Dict[str, Any]],
+                 overrides: Optional[Dict[str, Any]] = None, key: Optional[str] = None):
+        self.name = name
+        self.key = key
+        self.hotkey = hotkey
+        self.steps = steps
+        self.overrides = overrides or {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], base_dir: str = ".") -> "MacroProfile":
+        """从配置中的一项创建，步骤文件无法读取时抛出 ValueError"""
+        name = str(data.get("name") or data.get("hotkey") or "")
+        hotkey = data.get("hotkey")
+        if not hotkey:
+            raise ValueError(f"宏配置 {name} 缺少快捷键")
+        steps = data.get("steps")
+        key = None
+        if isinstance(steps, str):
+            path = steps if os.path.isabs(steps) else os.path.join(base_dir, steps)
+            manager = StepManager()
+            if not manager.load_from_file(path):
+                raise ValueError(f"宏配置 {name} 的步骤文件无法读取: {path}")
+            steps = manager.steps
+            key = file_hash(path)
+        if not isinstance(steps, list):
+            raise ValueError(f"宏配置 {name} 缺少步骤")
+        overrides = {key: value for key, value in data.items() if key not in cls.RESERVED}
+        return cls(name, str(hotkey), steps, overrides, key)
+
+    def engine_config(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """全局配置叠加本宏的覆盖项"""
+        merged = dict(config)
+        merged.update(self.overrides)
+        return merged
+
+def load_profiles(entries: List[Dict[str, Any]], base_dir: str = ".") -> List[MacroProfile]:
+    """加载配置中的宏列表，无效的项记录日志后跳过"""
+    profiles = []
+    for entry in entries or []:
+        try:
+            profiles.append(MacroProfile.from_dict(entry, base_dir))
+        except (ValueError, AttributeError) as e:
+            logger.error(f"加载宏配置失败: {e}")
+    return profiles
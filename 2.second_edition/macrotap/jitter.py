@@ -0,0 +1,108 @@
+import logging
+import random
+import time
+from array import array
+from typing import Callable, Dict, Optional, Tuple
+
+from .scheduler import seconds_to_ns
+
+logger = logging.getLogger("AutoClicker")
+
+# 每批预先生成的偏移个数，播放中只按下标取值，用完一批换用已生成好的下一批
+JITTER_BATCH = 10_000
+
+# 空闲时生成下一批偏移，每生成这么多个检查一次是否该返回
+JITTER_FILL_CHUNK = 256
+
+# 下一批未生成完时每次 apply() 顺带生成的个数；大于 1 保证换批前下一批一定已经生成完
+JITTER_APPLY_CHUNK = 2
+
+# 抖动分布: 名称 -> 以 scale 为幅度生成单个偏移的函数，偏移的均值都为 0
+JITTER_DISTRIBUTIONS: Dict[str, Callable[[random.Random, float], float]] = {
+    # [-scale, scale] 上的均匀分布
+    "uniform": lambda rng, scale: rng.uniform(-scale, scale),
+    # 标准差为 scale 的正态分布，截断到 ±3 倍标准差
+    "normal": lambda rng, scale: max(-3 * scale, min(3 * scale, rng.gauss(0.0, scale))),
+    # [-scale, scale] 上的三角分布，集中在 0 附近
+    "triangular": lambda rng, scale: rng.triangular(-scale, scale, 0.0),
+}
+
+class JitterSchedule:
+    """预先生成的随机延时偏移序列
+
+    偏移(纳秒)按 JITTER_BATCH 个一批生成到 array 中，apply() 只做一次下标读取和加法。
+    创建时生成当前批和下一批；一批用完时 apply() 直接换用下一批。再下一批由 fill_ahead()
+    在调度器空闲(粗略等待)时分块生成；间隔太短没有空闲时，每次 apply() 顺带生成
+    JITTER_APPLY_CHUNK 个，当前批用完之前下一批总能生成完，换批时不会集中生成。
+    同一个种子生成的序列完全相同，与分块方式无关，可用于复现某次运行的节奏。
+    """
+    def __init__(self, scale: float, distribution: str = "uniform", seed: Optional[int] = None,
+                 batch: int = JITTER_BATCH):
+        if scale < 0:
+            raise ValueError(f"抖动幅度不能为负数: {scale}")
+        if distribution not in JITTER_DISTRIBUTIONS:
+            raise ValueError(f"未知抖动分布: {distribution}")
+        if batch <= 0:
+            raise ValueError("每批偏移个数必须大于0")
+        self.scale_ns = float(seconds_to_ns(scale))
+        self.sample = JITTER_DISTRIBUTIONS[distribution]
+        self.rng = random.Random(seed)
+        self.batch = batch
+        self.offsets = array('q')
+        self.index = 0
+        # 正在生成的下一批，长度达到 batch 即可换用
+        self.spare = array('q')
+        self._generate(batch)
+        self.offsets, self.spare = self.spare, array('q')
+        self._generate(batch)
+
+    def _generate(self, count: int) -> None:
+        """向下一批追加最多 count 个偏移"""
+        rng, sample, scale_ns = self.rng, self.sample, self.scale_ns
+        count = min(count, self.batch - len(self.spare))
+        self.spare.extend(int(round(sample(rng, scale_ns))) for _ in range(count))
+
+    def fill_ahead(self, until_ns: int) -> None:
+        """在 until_ns(time.monotonic_ns())之前分块生成下一批偏移，供调度器空闲时调用"""
+        while len(self.spare) < self.batch and time.monotonic_ns() < until_ns:
+            self._generate(JITTER_FILL_CHUNK)
+
+    def swap(self) -> None:
+        """换用已生成好的下一批偏移"""
+        self.offsets, self.spare = self.spare, array('q')
+        self.index = 0
+
+    def apply(self, delay_ns: int) -> int:
+        """给延时加上下一个偏移，结果不小于 0"""
+        if len(self.spare) < self.batch:
+            self._generate(JITTER_APPLY_CHUNK)
+        index = self.index
+        if index == len(self.offsets):
+            self.swap()
+            index = 0
+        self.index = index + 1
+        delay_ns += self.offsets[index]
+        return delay_ns if delay_ns > 0 else 0
+
+def create_jitter(config: Dict) -> Tuple[Optional[JitterSchedule], Optional[JitterSchedule]]:
+    """按配置创建 (步骤抖动, 循环抖动)，幅度为 0 的一项为 None
+
+    两个序列的种子都由 config['jitter_seed'] 派生，创建时即生成前两批偏移；未指定种子时随机选取一个并写入日志，
+    用同一个种子再次运行即可得到相同的节奏。
+    """
+    step_scale = float(config.get('step_jitter') or 0)
+    loop_scale = float(config.get('loop_jitter') or 0)
+    distribution = config.get('jitter_dist') or "uniform"
+    if distribution not in JITTER_DISTRIBUTIONS:
+        raise ValueError(f"未知抖动分布: {distribution}")
+    if not step_scale and not loop_scale:
+        return None, None
+    seed = config.get('jitter_seed')
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+        logger.info(f"随机抖动种子: {seed}")
+    master = random.Random(seed)
+    step_seed, loop_seed = master.getrandbits(64), master.getrandbits(64)
+    step_jitter = JitterSchedule(step_scale, distribution, step_seed) if step_scale else None
+    loop_jitter = JitterSchedule(loop_scale, distribution, loop_seed) if loop_scale else None
+    return step_jitter, loop_jitter
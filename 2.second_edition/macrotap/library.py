@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional
+
+from .binfmt import BINARY_SUFFIX
+from .persist import atomic_write
+from .steps import StepManager
+
+logger = logging.getLogger("AutoClicker")
+
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+MACRO_SUFFIXES = (".json", BINARY_SUFFIX)
+
+class MacroEntry(NamedTuple):
+    """宏库索引中的一项"""
+    filename: str
+    name: str
+    tags: List[str]
+    step_count: int
+    hash: str
+    mtime_ns: int
+    size: int
+
+def file_hash(path: str) -> str:
+    """文件内容的 SHA-256，编译缓存以此为键"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class MacroLibrary:
+    """目录形式的宏库
+
+    目录中每个 .json/.mtap 文件是一个宏，index.json 保存名称、标签、步骤数、内容哈希以及
+    文件的修改时间和大小。打开宏库只读取索引；refresh() 只对修改时间或大小变化的文件
+    重新解析，步骤在 load() 时才读入。
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.entries: Dict[str, MacroEntry] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._read_index()
+
+    def _read_index(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                logger.warning("宏库索引版本不匹配，将重新建立")
+                return
+            for filename, item in data.get("macros", {}).items():
+                self.entries[filename] = MacroEntry(filename=filename, **item)
+        except Exception as e:
+            logger.error(f"读取宏库索引失败: {e}")
+            self.entries = {}
+
+    def _write_index(self) -> None:
+        data = {
+            "version": INDEX_VERSION,
+            "macros": {filename: {key: value for key, value in entry._asdict().items() if key != "filename"}
+                       for filename, entry in sorted(self.entries.items())},
+        }
+        atomic_write(self.index_path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    def path(self, filename: str) -> str:
+        """宏文件的完整路径"""
+        return os.path.join(self.directory, filename)
+
+    def _make_entry(self, filename: str, step_count: int, tags: List[str]) -> MacroEntry:
+        stat = os.stat(self.path(filename))
+        return MacroEntry(filename=filename, name=os.path.splitext(filename)[0], tags=tags,
+                          step_count=step_count, hash=file_hash(self.path(filename)),
+                          mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+
+    def _index_file(self, filename: str, tags: List[str]) -> Optional[MacroEntry]:
+        """解析一个宏文件并生成索引项，无法解析时返回 None"""
+        manager = StepManager()
+        if not manager.load_from_file(self.path(filename)):
+            return None
+        return self._make_entry(filename, len(manager.steps), tags)
+
+    def refresh(self) -> int:
+        """同步目录和索引，返回重新解析的文件数"""
+        found = {}
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if item.is_file() and item.name != INDEX_NAME and item.name.endswith(MACRO_SUFFIXES):
+                    found[item.name] = item.stat()
+
+        parsed = 0
+        changed = set(self.entries) - set(found)
+        for filename in changed:
+            del self.entries[filename]
+        for filename, stat in found.items():
+            entry = self.entries.get(filename)
+            if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                continue
+            new_entry = self._index_file(filename, entry.tags if entry is not None else [])
+            parsed += 1
+            changed.add(filename)
+            if new_entry is None:
+                self.entries.pop(filename, None)
+            else:
+                self.entries[filename] = new_entry
+        if changed:
+            self._write_index()
+        return parsed
+
+    def find(self, tag: Optional[str] = None, text: str = "") -> List[MacroEntry]:
+        """按名称排序的宏列表，可按标签和名称关键字过滤"""
+        text = text.lower()
+        return [entry for _, entry in sorted(self.entries.items())
+                if (tag is None or tag in entry.tags) and text in entry.name.lower()]
+
+    def get(self, filename: str) -> MacroEntry:
+        """获取索引项，不存在时抛出 KeyError"""
+        return self.entries[filename]
+
+    def load(self, filename: str) -> List[Dict[str, Any]]:
+        """读取宏的步骤，文件无法读取时抛出 ValueError"""
+        manager = StepManager()
+        if filename not in self.entries or not manager.load_from_file(self.path(filename)):
+            raise ValueError(f"无法读取宏: {filename}")
+        return manager.steps
+
+    def save(self, name: str, steps: List[Dict[str, Any]], tags: Iterable[str] = (),
+             suffix: str = ".json", compression: str = "none") -> MacroEntry:
+        """把步骤保存为宏库中的文件并更新索引"""
+        if not name or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(f"宏名称无效: {name!r}")
+        if suffix not in MACRO_SUFFIXES:
+            raise ValueError(f"不支持的文件类型: {suffix}")
+        filename = name + suffix
+        manager = StepManager()
+        manager.steps = steps
+        if not manager.save_to_file(self.path(filename), compression):
+            raise ValueError(f"保存宏失败: {filename}")
+        entry = self._make_entry(filename, len(steps), list(tags))
+        self.entries[filename] = entry
+        self._write_index()
+        return entry
+
+    def set_tags(self, filename: str, tags: Iterable[str]) -> None:
+        """修改标签，只写索引"""
+        self.entries[filename] = self.entries[filename]._replace(tags=list(tags))
+        self._write_index()
+
+    def delete(self, filename: str) -> None:
+        """删除宏文件和索引项"""
+        if filename in self.entries:
+            del self.entries[filename]
+            self._write_index()
+        if os.path.exists(self.path(filename)):
+            os.remove(self.path(filename))
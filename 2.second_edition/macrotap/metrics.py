@@ -0,0 +1,129 @@
+import time
+from array import array
+from typing import List, Tuple
+
+class LogHistogram:
+    """HDR 风格的对数分桶直方图
+
+    每个 2 的幂区间再分为 2**sub_bits 个子桶，相对误差约 1/2**sub_bits；
+    计数数组预先分配，记录时不分配内存。
+    """
+    def __init__(self, sub_bits: int = 4, max_bits: int = 48):
+        self.sub_bits = sub_bits
+        self.sub_count = 1 << sub_bits
+        self.max_value = (1 << max_bits) - 1
+        self.counts = array('q', bytes(8 * (max_bits - sub_bits + 1) * self.sub_count))
+        self.total = 0
+        self.max = 0
+
+    def bucket(self, value: int) -> int:
+        """数值所在的桶序号"""
+        if value < self.sub_count:
+            return value
+        shift = value.bit_length() - self.sub_bits - 1
+        return (shift + 1) * self.sub_count + (value >> shift) - self.sub_count
+
+    def bucket_upper(self, index: int) -> int:
+        """桶的上界(包含)"""
+        if index < self.sub_count:
+            return index
+        shift = index // self.sub_count - 1
+        return (((index % self.sub_count) + self.sub_count + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """记录一个非负整数"""
+        if value < 0:
+            value = 0
+        elif value > self.max_value:
+            value = self.max_value
+        self.counts[self.bucket(value)] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        """分位数(返回所在桶的上界)"""
+        if not self.total:
+            return 0
+        target = max(1, int(q * self.total + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucket_upper(index), self.max)
+        return self.max
+
+    def reset(self) -> None:
+        """清空计数"""
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total = 0
+        self.max = 0
+
+class StepTimings:
+    """逐步骤的时序记录
+
+    每个动作记录步骤序号、注入耗时和相对计划时间的偏差，写入固定大小的环形缓冲区，
+    同时累计到直方图；界面线程的响应延迟单独记录，便于区分瓶颈在后端、等待还是界面。
+    """
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self.step_index = array('i', bytes(4 * capacity))
+        self.timestamps = array('q', bytes(8 * capacity))
+        self.inject_ns = array('q', bytes(8 * capacity))
+        self.late_ns = array('q', bytes(8 * capacity))
+        self.inject_hist = LogHistogram()
+        self.late_hist = LogHistogram()
+        self.gui_lag_hist = LogHistogram()
+        self.count = 0
+
+    def reset(self) -> None:
+        """开始新的一次运行"""
+        self.count = 0
+        self.inject_hist.reset()
+        self.late_hist.reset()
+        self.gui_lag_hist.reset()
+
+    def record(self, index: int, late: int, inject: int) -> None:
+        """记录一个动作(引擎线程)"""
+        i = self.count % self.capacity
+        self.step_index[i] = index
+        self.timestamps[i] = time.monotonic_ns()
+        self.inject_ns[i] = inject
+        self.late_ns[i] = late
+        self.count += 1
+        self.inject_hist.record(inject)
+        self.late_hist.record(late)
+
+    def record_gui_lag(self, lag: int) -> None:
+        """记录界面线程处理更新的延迟"""
+        self.gui_lag_hist.record(lag)
+
+    def rows(self) -> List[Tuple[int, int, int, int]]:
+        """按时间顺序返回缓冲区中的 (时间戳, 步骤序号, 偏差ns, 注入耗时ns)"""
+        size = min(self.count, self.capacity)
+        result = []
+        for n in range(self.count - size, self.count):
+            i = n % self.capacity
+            result.append((self.timestamps[i], self.step_index[i], self.late_ns[i], self.inject_ns[i]))
+        return result
+
+    def summary(self) -> str:
+        """直方图摘要(微秒)"""
+        if not self.count:
+            return ""
+        inject, late, gui = self.inject_hist, self.late_hist, self.gui_lag_hist
+        text = (f"注入 p50 {inject.percentile(0.5) / 1000:.0f}us p99 {inject.percentile(0.99) / 1000:.0f}us | "
+                f"偏差 p50 {late.percentile(0.5) / 1000:.0f}us p99 {late.percentile(0.99) / 1000:.0f}us")
+        if gui.total:
+            text += f" | 界面 p99 {gui.percentile(0.99) / 1000:.0f}us"
+        return text
+
+    def export_csv(self, filename: str) -> int:
+        """导出原始数据为 CSV，返回行数"""
+        rows = self.rows()
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write("timestamp_ns,step_index,late_ns,inject_ns\n")
+            for row in rows:
+                f.write(",".join(map(str, row)) + "\n")
+        return len(rows)
@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger("AutoClicker")
+
+# 同一文件在这段时间内的多次保存请求合并为一次写入(秒)
+DEFAULT_DEBOUNCE = 0.5
+
+def atomic_write(filename: str, data: bytes) -> None:
+    """先写入同目录的临时文件并落盘，再原子替换目标文件
+
+    写入中途崩溃时目标文件保持旧内容，不会出现截断的文件。
+    """
+    temp = filename + ".tmp"
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, filename)
+
+class BackgroundWriter:
+    """在后台线程中执行的去抖动保存队列
+
+    submit() 以文件名为键登记一个保存函数，键已在队列中时只替换函数，截止时间不变；
+    到期后在后台线程中执行最后登记的函数，连续的修改因此只写一次。保存函数应只使用
+    提交时的快照，不能再读取界面线程会修改的对象。
+    """
+    def __init__(self, delay: float = DEFAULT_DEBOUNCE):
+        self.delay = delay
+        self.pending: Dict[str, Tuple[float, Callable[[], None]]] = {}
+        self.busy = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self.thread.start()
+
+    def submit(self, key: str, job: Callable[[], None]) -> None:
+        """登记保存函数，delay 秒后在后台执行"""
+        with self.condition:
+            if self.closed:
+                raise RuntimeError("后台写入线程已关闭")
+            due = self.pending[key][0] if key in self.pending else time.monotonic() + self.delay
+            self.pending[key] = (due, job)
+            self.condition.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """立即执行所有待保存的函数并等待完成，超时返回 False"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.pending = {key: (0.0, job) for key, (_, job) in self.pending.items()}
+            self.condition.notify_all()
+            while self.pending or self.busy:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 10.0) -> bool:
+        """写完待保存的内容后结束后台线程"""
+        done = self.flush(timeout)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join(timeout)
+        return done
+
+    def _run(self) -> None:
+        with self.condition:
+            while True:
+                if not self.pending:
+                    if self.closed:
+                        return
+                    self.condition.wait()
+                    continue
+                key = min(self.pending, key=lambda k: self.pending[k][0])
+                due, job = self.pending[key]
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                    continue
+                del self.pending[key]
+                self.busy = True
+                self.condition.release()
+                try:
+                    job()
+                except Exception as e:
+                    logger.error(f"后台保存 {key} 失败: {e}")
+                finally:
+                    self.condition.acquire()
+                    self.busy = False
+                    self.condition.notify_all()
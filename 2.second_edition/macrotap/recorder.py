@@ -0,0 +1,177 @@
+import itertools
+import logging
+import time
+from array import array
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from .backends import MOUSE_BUTTON_NAMES, SPECIAL_KEY_NAMES
+
+logger = logging.getLogger("AutoClicker")
+
+# 录制事件类型
+EVENT_MOUSE_PRESS = 1
+EVENT_MOUSE_RELEASE = 2
+EVENT_KEY_PRESS = 3
+EVENT_KEY_RELEASE = 4
+
+def key_name(key: Any) -> Optional[str]:
+    """pynput 按键对象 -> 步骤中的按键名称，无法表示时返回 None"""
+    char = getattr(key, "char", None)
+    if char:
+        return char
+    name = getattr(key, "name", None)
+    if name:
+        # ctrl_l/shift_r 等左右键归并到通用名称
+        base = name.split("_")[0]
+        return base if base in SPECIAL_KEY_NAMES else name
+    return None
+
+def events_to_steps(events: Iterable[Tuple[int, int, Any]], step_delay: float = 0.0,
+                    min_gap: float = 0.001, ignore_keys: Iterable[str] = (),
+                    stop_button: Optional[str] = None) -> List[Dict[str, Any]]:
+    """把 (时间戳纳秒, 事件类型, 名称) 序列转换为步骤列表
+
+    相邻事件的间隔减去播放时的步骤间隔后，超过 min_gap 的部分变成延时步骤。
+    开头没有对应按下的释放、按住按键时的自动重复以及 ignore_keys 中的按键会被丢弃。
+    录制是点击界面按钮停止的时，stop_button 为所用的鼠标按钮，结尾这一次完整的点击也会被丢弃。
+    """
+    ignore = set(ignore_keys)
+    pressed = set()
+    steps: List[Dict[str, Any]] = []
+    last_ns = None
+    for timestamp, kind, name in events:
+        if name is None or name in ignore:
+            continue
+        if kind == EVENT_MOUSE_PRESS or kind == EVENT_MOUSE_RELEASE:
+            step_type, field, token = "mouse", "button", ("mouse", name)
+        else:
+            step_type, field, token = "keyboard", "key", ("key", name)
+        is_press = kind == EVENT_MOUSE_PRESS or kind == EVENT_KEY_PRESS
+        if is_press:
+            if token in pressed:
+                continue
+            pressed.add(token)
+        else:
+            if token not in pressed:
+                continue
+            pressed.discard(token)
+
+        if last_ns is not None:
+            gap = (timestamp - last_ns) / 1_000_000_000 - step_delay
+            if gap >= min_gap:
+                steps.append({"type": "delay", "duration": round(gap, 3)})
+        last_ns = timestamp
+        steps.append({"type": step_type, field: name, "action": "press" if is_press else "release"})
+
+    # 结尾未释放的鼠标按下通常是点击停止按钮，丢弃
+    while steps and steps[-1]["type"] == "mouse" and steps[-1]["action"] == "press":
+        steps.pop()
+    if stop_button is not None:
+        release = {"type": "mouse", "button": stop_button, "action": "release"}
+        if steps and steps[-1] == release:
+            i = len(steps) - 2
+            while i >= 0 and steps[i]["type"] == "delay":
+                i -= 1
+            if i >= 0 and steps[i] == dict(release, action="press"):
+                del steps[i:]
+    while steps and steps[-1]["type"] == "delay":
+        steps.pop()
+    return steps
+
+class MacroRecorder:
+    """用 pynput 监听器录制真实输入
+
+    监听回调只把 (时间戳, 事件类型, 原始对象) 写入预先分配的缓冲区，不做任何转换，
+    以免增加输入延迟；stop() 之后再由 to_steps() 转换为步骤。
+    """
+    def __init__(self, capacity: int = 200_000):
+        self.capacity = capacity
+        self.timestamps = array('q', bytes(8 * capacity))
+        self.kinds = array('B', bytes(capacity))
+        self.args: List[Any] = [None] * capacity
+        self.mouse_listener = None
+        self.keyboard_listener = None
+        self._slots = itertools.count()
+        self.count = 0
+
+    @property
+    def is_recording(self) -> bool:
+        """是否正在录制"""
+        return self.keyboard_listener is not None
+
+    @property
+    def dropped(self) -> int:
+        """缓冲区满后丢弃的事件数"""
+        return max(0, self.count - self.capacity)
+
+    def _append(self, kind: int, arg: Any) -> None:
+        # next() 在 GIL 下是原子的，两个监听线程不会拿到同一个位置；
+        # 事件数在 stop() 中统一得出，这里不写共享的计数，以免两个线程交错时计数倒退
+        i = next(self._slots)
+        if i < self.capacity:
+            self.timestamps[i] = time.monotonic_ns()
+            self.kinds[i] = kind
+            self.args[i] = arg
+
+    def _on_click(self, x, y, button, pressed) -> None:
+        self._append(EVENT_MOUSE_PRESS if pressed else EVENT_MOUSE_RELEASE, button)
+
+    def _on_press(self, key) -> None:
+        self._append(EVENT_KEY_PRESS, key)
+
+    def _on_release(self, key) -> None:
+        self._append(EVENT_KEY_RELEASE, key)
+
+    def start(self) -> None:
+        """开始录制，清空之前的事件"""
+        from pynput import mouse, keyboard
+
+        if self.is_recording:
+            return
+        self._slots = itertools.count()
+        self.count = 0
+        self.mouse_listener = mouse.Listener(on_click=self._on_click)
+        self.keyboard_listener = keyboard.Listener(on_press=self._on_press, on_release=self._on_release)
+        self.mouse_listener.daemon = True
+        self.keyboard_listener.daemon = True
+        self.mouse_listener.start()
+        self.keyboard_listener.start()
+
+    def stop(self) -> None:
+        """停止录制，等待监听线程退出后得出录制的事件数"""
+        listeners = [listener for listener in (self.mouse_listener, self.keyboard_listener)
+                     if listener is not None]
+        for listener in listeners:
+            listener.stop()
+        for listener in listeners:
+            listener.join(1.0)
+        self.mouse_listener = None
+        self.keyboard_listener = None
+        if listeners:
+            # 下一个未分配的位置即已分配的事件数
+            self.count = next(self._slots)
+        if self.dropped:
+            logger.warning(f"录制缓冲区已满，丢弃 {self.dropped} 个事件")
+
+    def events(self) -> List[Tuple[int, int, Optional[str]]]:
+        """已录制的 (时间戳纳秒, 事件类型, 名称) 列表"""
+        result = []
+        for i in range(min(self.count, self.capacity)):
+            kind = self.kinds[i]
+            arg = self.args[i]
+            if kind == EVENT_MOUSE_PRESS or kind == EVENT_MOUSE_RELEASE:
+                name = getattr(arg, "name", None)
+                if name not in MOUSE_BUTTON_NAMES:
+                    name = None
+            else:
+                name = key_name(arg)
+            result.append((self.timestamps[i], kind, name))
+        # 两个监听线程写入的顺序可能与时间戳略有出入
+        result.sort(key=lambda event: event[0])
+        return result
+
+    def to_steps(self, step_delay: float = 0.0, ignore_keys: Iterable[str] = (),
+                 stop_button: Optional[str] = None) -> List[Dict[str, Any]]:
+        """把录制的事件转换为步骤列表，stop_button 见 events_to_steps"""
+        return events_to_steps(self.events(), step_delay=step_delay, ignore_keys=ignore_keys,
+                               stop_button=stop_button)
@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Callable, List, Optional
+
+def seconds_to_ns(seconds: float) -> int:
+    """秒转换为整数纳秒"""
+    return int(round(seconds * 1_000_000_000))
+
+class DeadlineScheduler:
+    """基于 time.monotonic_ns() 绝对截止时间的调度器
+
+    每个动作的触发时间都由起点累加间隔得到，注入耗时和 sleep 超时不会累积成漂移。
+    先粗略 sleep 到截止时间前 spin_ns，再忙等到截止时间，以获得亚毫秒精度。
+    粗略等待期间 set wake 事件可以提前唤醒，此时 wait() 返回 None，截止时间不变。
+    需要粗略等待时先依次调用 idle 中的函数做预备工作，参数为应当返回的时刻(纳秒)。
+    """
+    def __init__(self, spin_ns: int = 2_000_000, max_catchup_ns: int = 1_000_000_000):
+        self.spin_ns = spin_ns
+        # 落后超过该值时(如系统挂起)重新对齐起点，而不是连发补点
+        self.max_catchup_ns = max_catchup_ns
+        self.idle: List[Callable[[int], None]] = []
+        self.deadline = 0
+        self.wake = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """清空迟到统计"""
+        self.count = 0
+        self.last_late_ns = 0
+        self.total_late_ns = 0
+        self.max_late_ns = 0
+
+    def start(self, at_ns: Optional[int] = None) -> None:
+        """以 at_ns(省略时为当前时间)作为第一个动作的截止时间"""
+        self.deadline = time.monotonic_ns() if at_ns is None else at_ns
+        self.reset_stats()
+
+    def advance(self, delay_ns: int) -> None:
+        """将下一个截止时间向后推 delay_ns"""
+        self.deadline += delay_ns
+
+    def wait(self) -> Optional[int]:
+        """等待到当前截止时间，返回实际迟到的纳秒数；被 wake 提前唤醒时返回 None"""
+        deadline = self.deadline
+        remaining = deadline - time.monotonic_ns()
+        if remaining > self.spin_ns:
+            if self.idle:
+                for task in self.idle:
+                    task(deadline - self.spin_ns)
+                remaining = deadline - time.monotonic_ns()
+            if remaining > self.spin_ns and self.wake.wait((remaining - self.spin_ns) / 1_000_000_000):
+                return None
+        now = time.monotonic_ns()
+        while now < deadline:
+            now = time.monotonic_ns()
+
+        late = now - deadline
+        if late > self.max_catchup_ns:
+            self.deadline = now
+        self.count += 1
+        self.last_late_ns = late
+        self.total_late_ns += late
+        if late > self.max_late_ns:
+            self.max_late_ns = late
+        return late
+
+    def summary(self) -> str:
+        """迟到统计摘要(毫秒)"""
+        if not self.count:
+            return ""
+        mean_ms = self.total_late_ns / self.count / 1_000_000
+        return f"偏差 平均{mean_ms:.2f}ms 最大{self.max_late_ns / 1_000_000:.2f}ms"
@@ -0,0 +1,34 @@
+from typing import NamedTuple, Optional, Tuple
+
+class EngineStatus(NamedTuple):
+    """引擎状态快照"""
+    loop: int
+    max_loops: int
+    step: int
+    actions: int
+    actions_per_sec: float
+    loops_per_min: float
+    late_mean_ms: float
+    late_max_ms: float
+    target_rate: float = 0.0
+    target_unit: str = 'aps'
+    paused: bool = False
+    # 目标速率无法达到(延时步骤已超过每轮的周期等)
+    rate_overrun: bool = False
+
+class StatusSlot:
+    """单槽位状态通道
+
+    写入方(引擎线程)每次整体替换快照，读取方(界面线程)按固定频率轮询，只看最新值；
+    旧值直接被覆盖，不会排队，界面开销与引擎速度无关。引用赋值在 GIL 下是原子的，无需加锁。
+    """
+    def __init__(self):
+        self._latest: Tuple[int, Optional[EngineStatus]] = (0, None)
+
+    def publish(self, status: EngineStatus) -> None:
+        """发布新快照"""
+        self._latest = (self._latest[0] + 1, status)
+
+    def read(self) -> Tuple[int, Optional[EngineStatus]]:
+        """返回 (版本号, 最新快照)，版本号未变说明没有新数据"""
+        return self._latest
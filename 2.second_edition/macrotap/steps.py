@@ -0,0 +1,139 @@
+import json
+import logging
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from .binfmt import BINARY_SUFFIX, is_binary_macro, load_binary, save_binary
+from .persist import atomic_write
+
+logger = logging.getLogger("AutoClicker")
+
+def dump_steps(steps: List[Dict[str, Any]], filename: str, compression: str = "none") -> None:
+    """把步骤列表原子地写入文件，扩展名为 .mtap 时写二进制格式，失败时抛出异常"""
+    if filename.endswith(BINARY_SUFFIX):
+        save_binary(steps, filename, compression)
+    else:
+        atomic_write(filename, json.dumps(steps, ensure_ascii=False, indent=2).encode("utf-8"))
+
+class StepManager:
+    """步骤管理器
+
+    每次修改都会以 (变更类型, 参数...) 通知订阅者，界面据此只更新受影响的行:
+    ("insert", 序号)、("delete", 序号)、("update", 序号)、("move", 原序号, 新序号)、("reset",)。
+    每次修改 revision 加一，与 saved_revision 不同时说明有未保存的修改。
+    """
+    def __init__(self):
+        self.steps = []
+        self.listeners: List[Callable[..., None]] = []
+        self.revision = 0
+        self.saved_revision = 0
+
+    @property
+    def dirty(self) -> bool:
+        """是否有未保存的修改"""
+        return self.revision != self.saved_revision
+
+    def snapshot(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """返回 (版本号, 步骤列表的浅拷贝)，供其他线程保存
+
+        修改步骤时总是整体替换步骤字典，浅拷贝即可与之后的修改隔离。
+        """
+        return self.revision, list(self.steps)
+
+    def mark_saved(self, revision: int) -> None:
+        """记录 revision 版本已写入文件"""
+        self.saved_revision = revision
+
+    def subscribe(self, listener: Callable[..., None]) -> None:
+        """订阅步骤变更"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[..., None]) -> None:
+        """取消订阅"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, kind: str, *args: int) -> None:
+        self.revision += 1
+        for listener in list(self.listeners):
+            listener(kind, *args)
+
+    def add_step(self, step_data: Dict[str, Any]) -> None:
+        """添加步骤"""
+        self.steps.append(step_data)
+        self._notify("insert", len(self.steps) - 1)
+
+    def insert_step(self, index: int, step_data: Dict[str, Any]) -> None:
+        """在指定位置插入步骤"""
+        index = max(0, min(index, len(self.steps)))
+        self.steps.insert(index, step_data)
+        self._notify("insert", index)
+
+    def remove_step(self, index: int) -> Optional[Dict[str, Any]]:
+        """删除步骤"""
+        if 0 <= index < len(self.steps):
+            step = self.steps.pop(index)
+            self._notify("delete", index)
+            return step
+        return None
+
+    def set_steps(self, steps: List[Dict[str, Any]]) -> None:
+        """整体替换步骤列表"""
+        self.steps = steps
+        self._notify("reset")
+
+    def clear(self) -> None:
+        """清空所有步骤"""
+        self.steps.clear()
+        self._notify("reset")
+
+    def get_step(self, index: int) -> Optional[Dict[str, Any]]:
+        """获取指定步骤"""
+        if 0 <= index < len(self.steps):
+            return self.steps[index]
+        return None
+
+    def update_step(self, index: int, step_data: Dict[str, Any]) -> bool:
+        """更新步骤"""
+        if 0 <= index < len(self.steps):
+            self.steps[index] = step_data
+            self._notify("update", index)
+            return True
+        return False
+
+    def move_step(self, from_index: int, to_index: int) -> bool:
+        """移动步骤位置"""
+        if 0 <= from_index < len(self.steps) and 0 <= to_index < len(self.steps):
+            step = self.steps.pop(from_index)
+            self.steps.insert(to_index, step)
+            self._notify("move", from_index, to_index)
+            return True
+        return False
+
+    def save_to_file(self, filename: str, compression: str = "none") -> bool:
+        """保存步骤到文件，扩展名为 .mtap 时保存为二进制格式"""
+        try:
+            revision = self.revision
+            dump_steps(self.steps, filename, compression)
+            self.mark_saved(revision)
+            return True
+        except Exception as e:
+            logger.error(f"保存步骤到文件失败: {e}")
+            return False
+
+    def load_from_file(self, filename: str) -> bool:
+        """从文件加载步骤，自动识别 JSON 和二进制格式"""
+        try:
+            if is_binary_macro(filename):
+                self.set_steps(load_binary(filename))
+                self.mark_saved(self.revision)
+                return True
+            with open(filename, 'r', encoding='utf-8') as f:
+                steps = json.load(f)
+            if not isinstance(steps, list):
+                raise ValueError("文件内容不是步骤列表(多轨道时间线请用 python -m macrotap run 播放)")
+            self.set_steps(steps)
+            self.mark_saved(self.revision)
+            return True
+        except Exception as e:
+            logger.error(f"从文件加载步骤失败: {e}")
+            return False
@@ -0,0 +1,204 @@
+import logging
+import lzma
+import queue
+import threading
+import zlib
+from typing import List, Any, Iterator, Optional, Callable, Tuple
+
+from .backends import InputBackend, MOUSE_BUTTON_NAMES
+from .binfmt import (
+    HEADER, RECORD, MAGIC, FORMAT_VERSION,
+    COMPRESS_NONE, COMPRESS_ZLIB, COMPRESS_LZMA,
+    OP_MOUSE_CLICK, OP_MOUSE_PRESS, OP_MOUSE_RELEASE, OP_MOUSE_MOVE,
+    OP_KEY_PRESS, OP_KEY_RELEASE, OP_KEY_TYPE, OP_DELAY, OP_MOUSE_BURST,
+)
+from .compiler import CompiledStep, burst_actions
+
+logger = logging.getLogger("AutoClicker")
+
+# 读取线程放入队列的结束标记
+_END = object()
+
+class MacroStream:
+    """流式读取的二进制宏文件
+
+    后台线程按 chunk_records 条记录为单位读取(压缩文件边读边解压)，最多预读 readahead 块，
+    内存占用与宏长度无关(lzma 解压器自身约 8MB 的字典是固定开销)。多次循环时读取线程
+    在文件末尾直接回到数据起点继续预读，下一轮开始时无需重新打开文件。
+    """
+    def __init__(self, filename: str, chunk_records: int = 4096, readahead: int = 4):
+        self.filename = filename
+        self.chunk_bytes = chunk_records * RECORD.size
+        self.readahead = readahead
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise ValueError("文件太短，不是有效的二进制宏文件")
+            magic, version, self.compression, _, self.count, self.strtab_len = HEADER.unpack(header)
+            if magic != MAGIC:
+                raise ValueError("魔数不匹配，不是二进制宏文件")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"不支持的文件版本: {version}")
+            if self.compression not in (COMPRESS_NONE, COMPRESS_ZLIB, COMPRESS_LZMA):
+                raise ValueError(f"未知压缩方式: {self.compression}")
+            data = self._open_data(f)
+            strtab = self._read_exact(data, self.strtab_len)
+        text = strtab.decode("utf-8")
+        self.strings = text.split("\0") if self.strtab_len else []
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _open_data(self, f) -> Callable[[int], bytes]:
+        """返回按字节数读取(解压后)数据区的函数，f 需位于头部之后"""
+        if self.compression == COMPRESS_NONE:
+            return f.read
+        is_zlib = self.compression == COMPRESS_ZLIB
+        decompressor = zlib.decompressobj() if is_zlib else lzma.LZMADecompressor()
+        pending = bytearray()
+
+        def read(size: int) -> bytes:
+            # 用 max_length 限制每次解压的输出，高压缩比的文件也不会一次展开过多数据
+            while len(pending) < size and not decompressor.eof:
+                if is_zlib:
+                    data = decompressor.unconsumed_tail or f.read(65536)
+                else:
+                    data = f.read(65536) if decompressor.needs_input else b""
+                if not data and (is_zlib or decompressor.needs_input):
+                    break
+                pending.extend(decompressor.decompress(data, size - len(pending)))
+            chunk = bytes(pending[:size])
+            del pending[:size]
+            return chunk
+        return read
+
+    @staticmethod
+    def _read_exact(read: Callable[[int], bytes], size: int) -> bytes:
+        data = read(size)
+        if len(data) != size:
+            raise ValueError("文件在数据区中途结束")
+        return data
+
+    def _reader(self, loops: int, out: "queue.Queue", stop: threading.Event) -> None:
+        """读取线程: 每轮读完后放入 None 作为循环边界"""
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        try:
+            with open(self.filename, 'rb') as f:
+                done = 0
+                while not stop.is_set() and (loops == 0 or done < loops):
+                    f.seek(HEADER.size)
+                    read = self._open_data(f)
+                    self._read_exact(read, self.strtab_len)
+                    remaining = self.count * RECORD.size
+                    while remaining > 0:
+                        chunk = self._read_exact(read, min(self.chunk_bytes, remaining))
+                        remaining -= len(chunk)
+                        if not put(chunk):
+                            return
+                    done += 1
+                    if not put(None):
+                        return
+        except Exception as e:
+            logger.error(f"流式读取宏文件失败: {e}")
+            put(e)
+        finally:
+            put(_END)
+
+    def chunks(self, loops: int = 1) -> Iterator[Optional[bytes]]:
+        """依次产出记录块，每轮结束产出 None；loops 为 0 表示无限循环
+
+        提前结束迭代(break 或生成器被关闭)时读取线程随之退出。
+        """
+        out: "queue.Queue" = queue.Queue(maxsize=self.readahead)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._reader, args=(loops, out, stop), daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _END:
+                    return
+                if isinstance(item, Exception):
+                    raise ValueError(f"流式读取宏文件失败: {item}") from item
+                yield item
+        finally:
+            stop.set()
+
+class RecordCompiler:
+    """把二进制记录块直接编译为动作，不经过步骤字典
+
+    按钮在创建时解析，按键/坐标在首次出现时解析并缓存；延时差值和记录序号跨块累加，
+    reset() 在每轮开始时清零。
+    """
+    def __init__(self, backend: InputBackend, strings: List[str], step_delay_ns: int):
+        self.backend = backend
+        self.strings = strings
+        self.step_delay_ns = step_delay_ns
+        self.buttons = [backend.resolve_button(name) for name in MOUSE_BUTTON_NAMES]
+        self.methods = {
+            OP_MOUSE_CLICK: backend.click,
+            OP_MOUSE_PRESS: backend.press_button,
+            OP_MOUSE_RELEASE: backend.release_button,
+            OP_MOUSE_MOVE: backend.move,
+            OP_KEY_PRESS: backend.press_key,
+            OP_KEY_RELEASE: backend.release_key,
+            OP_KEY_TYPE: backend.type,
+        }
+        self.resolved = {}
+        self.bursts = {}
+        self.delay_us = 0
+        self.position = 0
+
+    def reset(self) -> None:
+        """新一轮从文件开头解码"""
+        self.delay_us = 0
+        self.position = 0
+
+    def _resolve(self, opcode: int, arg: int) -> Any:
+        key = (opcode == OP_MOUSE_MOVE, opcode == OP_KEY_TYPE, arg)
+        if key not in self.resolved:
+            text = self.strings[arg]
+            if opcode == OP_MOUSE_MOVE:
+                x, y = text.split(",")
+                self.resolved[key] = (int(x), int(y))
+            elif opcode == OP_KEY_TYPE:
+                self.resolved[key] = text
+            else:
+                self.resolved[key] = self.backend.resolve_key(text)
+        return self.resolved[key]
+
+    def compile_chunk(self, chunk: bytes) -> Tuple[List[CompiledStep], List[int]]:
+        """编译一个记录块为 (动作列表, 各动作对应的记录序号)，记录与步骤一一对应"""
+        actions: List[CompiledStep] = []
+        step_delay_ns = self.step_delay_ns
+        methods = self.methods
+        delay_us = self.delay_us
+        sources: List[int] = []
+        for position, (opcode, arg, delta) in enumerate(RECORD.iter_unpack(chunk), self.position):
+            delay_us += delta
+            if opcode == OP_DELAY:
+                actions.append((None, None, delay_us * 1000))
+            elif OP_MOUSE_CLICK <= opcode <= OP_MOUSE_RELEASE:
+                actions.append((methods[opcode], self.buttons[arg], step_delay_ns))
+            elif opcode == OP_MOUSE_BURST:
+                if arg not in self.bursts:
+                    button, count, cps = self.strings[arg].split(",")
+                    self.bursts[arg] = burst_actions(self.backend, self.backend.resolve_button(button),
+                                                     int(count), float(cps), step_delay_ns)
+                actions.extend(self.bursts[arg])
+            elif opcode in methods:
+                actions.append((methods[opcode], self._resolve(opcode, arg), step_delay_ns))
+            else:
+                raise ValueError(f"未知操作码: {opcode}")
+            sources.extend([position] * (len(actions) - len(sources)))
+        self.delay_us = delay_us
+        self.position += len(chunk) // RECORD.size
+        return actions, sources
@@ -0,0 +1,217 @@
+import heapq
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+from .backends import PynputBackend
+from .compiler import CompiledStep, compile_program, follow_jumps, is_jump
+from .engine import MacroEngine
+from .persist import atomic_write
+from .scheduler import seconds_to_ns
+
+logger = logging.getLogger("AutoClicker")
+
+class Track:
+    """时间线中的一条轨道: 独立的步骤、步骤间隔、循环间隔、循环次数和起始偏移
+
+    未指定的间隔和循环次数沿用引擎配置。
+    """
+    def __init__(self, steps: List[Dict[str, Any]], name: str = "",
+                 step_delay: Optional[float] = None, loop_delay: Optional[float] = None,
+                 loop_count: Optional[int] = None, offset: float = 0.0):
+        self.steps = steps
+        self.name = name
+        self.step_delay = step_delay
+        self.loop_delay = loop_delay
+        self.loop_count = loop_count
+        self.offset = offset
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Track":
+        """从轨道字典创建"""
+        steps = data.get("steps")
+        if not isinstance(steps, list):
+            raise ValueError(f"轨道缺少步骤列表: {data.get('name', '')}")
+        return cls(steps, name=str(data.get("name", "")),
+                   step_delay=data.get("step_delay"), loop_delay=data.get("loop_delay"),
+                   loop_count=data.get("loop_count"), offset=float(data.get("offset", 0.0)))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为轨道字典，省略沿用引擎配置的字段"""
+        data: Dict[str, Any] = {"name": self.name, "steps": self.steps}
+        for key in ("step_delay", "loop_delay", "loop_count"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        if self.offset:
+            data["offset"] = self.offset
+        return data
+
+def is_timeline(data: Any) -> bool:
+    """JSON 内容是否为多轨道时间线 ({"tracks": [...]})"""
+    return isinstance(data, dict) and isinstance(data.get("tracks"), list)
+
+def is_timeline_file(filename: str) -> bool:
+    """只看文件开头判断是否为时间线(JSON 对象)，普通步骤文件是 JSON 数组"""
+    try:
+        with open(filename, 'rb') as f:
+            head = f.read(64)
+    except OSError:
+        return False
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"{")
+
+def load_timeline(filename: str) -> List[Track]:
+    """读取多轨道时间线文件"""
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not is_timeline(data):
+        raise ValueError("不是多轨道时间线文件，应为 {\"tracks\": [...]}")
+    return [Track.from_dict(track) for track in data["tracks"]]
+
+def save_timeline(tracks: List[Track], filename: str) -> None:
+    """保存多轨道时间线文件，先写临时文件再替换"""
+    data = {"tracks": [track.to_dict() for track in tracks]}
+    atomic_write(filename, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+class TimelineEngine(MacroEngine):
+    """在同一个线程中并行播放多条轨道
+
+    每条轨道单独编译；最小堆中保存各轨道下一个动作的 (截止时间, 轨道序号, 动作位置, 已开始轮数)，
+    每次取出最早的一个执行后再放回，调度开销为 O(log 轨道数)，不需要每条轨道一个线程。
+    截止时间相同时按轨道序号先后执行。所有轨道播放完或被停止时结束，
+    并释放各轨道此时仍按住的按键和鼠标按钮。
+
+    current_loop 为第一条轨道开始的轮数；目标速率设置对时间线不生效，随机抖动由所有轨道共用。
+    """
+    def prepare(self) -> None:
+        """创建后端并编译所有轨道"""
+        if self.prepared:
+            return
+        self._create_jitter()
+        if self.backend is None:
+            self.backend = PynputBackend()
+        self.program = self._compile_tracks()
+        self.prepared = True
+
+    def run(self, start_ns: Optional[int] = None) -> int:
+        """在调用线程中播放所有轨道，返回第一条轨道完成的循环次数"""
+        self.start_at_ns = start_ns
+        try:
+            self.prepare()
+            self._play_tracks(self.program)
+        finally:
+            self.is_running = False
+            self.publish_status()
+        return self.current_loop
+
+    def _compile_tracks(self) -> List[Tuple[Tuple[CompiledStep, ...], int, int, int, Tuple[int, ...]]]:
+        """编译所有轨道为 (动作序列, 循环间隔纳秒, 循环次数, 起始偏移纳秒, 来源步骤序号)"""
+        compiled = []
+        for i, track in enumerate(self.steps):
+            step_delay = self.config['step_delay'] if track.step_delay is None else track.step_delay
+            loop_delay = self.config['loop_delay'] if track.loop_delay is None else track.loop_delay
+            loop_count = self.max_loops if track.loop_count is None else int(track.loop_count)
+            try:
+                program, sources = compile_program(track.steps, self.backend, step_delay)
+            except ValueError as e:
+                raise ValueError(f"轨道{i+1} {track.name}: {e}") from e
+            if loop_count < 0:
+                raise ValueError(f"轨道{i+1} {track.name}: 循环次数不能为负数")
+            compiled.append((program, seconds_to_ns(loop_delay), loop_count, seconds_to_ns(track.offset), sources))
+        return compiled
+
+    def _held_inputs(self, programs, positions: Dict[int, Tuple[int, int]]) -> List[Tuple[Any, Any]]:
+        """结束时仍按住的按键/按钮，返回 (释放方法, 参数) 列表
+
+        positions 为未播放完的轨道停下时的 (位置, 轮数)，其余轨道视为已完整执行；
+        只在结束时按动作序列推算一次，播放过程中不做任何记录。含跳转的轨道无法按位置
+        推算，保守地释放其中按下过的所有按键。
+        """
+        backend = self.backend
+        releases = {backend.press_key: backend.release_key, backend.press_button: backend.release_button}
+        held: Dict[Tuple[Any, Any], bool] = {}
+        for track, program in enumerate(programs):
+            if any(is_jump(instruction) for instruction in program):
+                for func, arg, _ in program:
+                    if func in releases:
+                        held[(releases[func], arg)] = True
+                continue
+            pc, loop = positions.get(track, (len(program), 1))
+            executed = program[:pc] if loop == 1 else program + program[:pc]
+            for func, arg, _ in executed:
+                if func in releases:
+                    held[(releases[func], arg)] = True
+                elif func in releases.values():
+                    held.pop((func, arg), None)
+        return list(held)
+
+    def _play_tracks(self, compiled) -> None:
+        """按最小堆合并各轨道的截止时间并执行"""
+        scheduler = self.scheduler
+        timings = self.timings
+        step_jitter = self.step_jitter
+        loop_jitter = self.loop_jitter
+        self._start()
+        start = scheduler.deadline
+        # 每条轨道自己的跳转计数，每轮开始时清空；堆中的 pc 总是指向动作或延时
+        counters: List[Dict[int, int]] = [{} for _ in compiled]
+        heap = []
+        for track, (program, _, _, offset, _) in enumerate(compiled):
+            pc = follow_jumps(program, 0, counters[track])
+            if pc < len(program):
+                heap.append((start + offset, track, pc, 1))
+        heapq.heapify(heap)
+        if any(entry[1] == 0 for entry in heap):
+            self._begin_loop()
+        try:
+            while heap:
+                deadline, track, pc, loop = heap[0]
+                scheduler.deadline = deadline
+                late = scheduler.wait()
+                if late is None or self.pausing:
+                    paused_ns = self.paused_ns
+                    late = self._wait_paused(late)
+                    if self.paused_ns != paused_ns:
+                        # 所有轨道一起顺延，堆的顺序不变；当前项随后被替换
+                        shift = self.paused_ns - paused_ns
+                        heap[:] = [(entry[0] + shift,) + entry[1:] for entry in heap]
+                if not self.is_running:
+                    break
+                program, loop_delay_ns, loop_count, _, sources = compiled[track]
+                func, arg, delay_ns = program[pc]
+                self.current_step = sources[pc]
+                if scheduler.deadline >= self.next_status_ns:
+                    self.publish_status()
+                if func is not None:
+                    self.actions_done += 1
+                    if timings is None:
+                        func(arg)
+                    else:
+                        started = time.monotonic_ns()
+                        func(arg)
+                        timings.record(sources[pc], late, time.monotonic_ns() - started)
+                # 落后过多时调度器会重新对齐截止时间，以对齐后的时间为准
+                # 随机抖动只加在一步结束后的间隔上，连发各批之间不加
+                if step_jitter is not None and (pc + 1 == len(program) or sources[pc + 1] != sources[pc]):
+                    delay_ns = step_jitter.apply(delay_ns)
+                deadline = scheduler.deadline + delay_ns
+                pc = follow_jumps(program, pc + 1, counters[track])
+                if pc == len(program):
+                    if loop_count and loop >= loop_count:
+                        heapq.heappop(heap)
+                        continue
+                    counters[track] = {}
+                    pc = follow_jumps(program, 0, counters[track])
+                    loop += 1
+                    deadline += loop_delay_ns if loop_jitter is None else loop_jitter.apply(loop_delay_ns)
+                    if track == 0:
+                        scheduler.deadline = deadline
+                        self._begin_loop()
+                heapq.heapreplace(heap, (deadline, track, pc, loop))
+        finally:
+            positions = {track: (pc, loop) for _, track, pc, loop in heap}
+            for release, arg in self._held_inputs([entry[0] for entry in compiled], positions):
+                try:
+                    release(arg)
+                except Exception as e:
+                    logger.error(f"释放按键失败: {e}")